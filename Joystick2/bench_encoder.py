@@ -0,0 +1,66 @@
+# bench_encoder.py
+# Checks PPMEncoder against the frames the original inline loop produced and
+# measures encodes/second. Pure Python, runs on any dev box.
+#   python bench_encoder.py [seconds per case]
+import sys
+import timeit
+from ppm import PPMFrameSpec, PPMEncoder
+
+pi_gpio = 1 << 18
+
+# the original 3 channel / 20ms frame, pulses as (on, off, delay) triples
+LEGACY_FRAME = PPMFrameSpec(channels=3, frame_us=20000, sync_us=300)
+
+# (throttle, ail, elev) = (-1, 0, 0.5), straight from the old main loop
+GOLDEN_FRAME = [
+    (0, pi_gpio, 300), (pi_gpio, 0, 700),
+    (0, pi_gpio, 300), (pi_gpio, 0, 1200),
+    (0, pi_gpio, 300), (pi_gpio, 0, 1450),
+    (0, pi_gpio, 300), (pi_gpio, 0, 15449),
+]
+
+def legacy_encode(values):
+    # the pulse building loop as it was inlined in joystick2.py
+    pulses, pos = [], 0
+    for value in values:
+        us = int(round(1500 + 500 * value))
+        pulses += [(0, pi_gpio, 300),
+            (pi_gpio, 0, us -300)]
+        pos += us
+    pulses += [(0, pi_gpio, 300),
+           (pi_gpio, 0, 20000 - 300 - pos - 1)]
+    return pulses
+
+def check_golden():
+    encoder = PPMEncoder(LEGACY_FRAME, pi_gpio)
+    assert encoder.encode((-1, 0, 0.5)) == GOLDEN_FRAME, encoder.encode((-1, 0, 0.5))
+    # sweep the whole stick range, the legacy loop never clamped so stay in -1..1
+    steps = [i / 50 - 1 for i in range(101)]
+    for t in steps:
+        for v in steps:
+            values = (t, v, -v)
+            assert encoder.encode(values) == legacy_encode(values), values
+    print("golden frames match")
+
+def bench(name, fn, seconds):
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    runs = max(1, int(seconds / 0.2))
+    best = min(timer.repeat(repeat=runs, number=number)) / number
+    print(f"{name:24} {best * 1e6:7.2f} us/encode  {1 / best:10.0f} encodes/s")
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+    check_golden()
+    values3 = (0.25, -0.5, 0.75)
+    values8 = (0.25, -0.5, 0.75, 0, 1, -1, 0.1, -0.1)
+    encoder3 = PPMEncoder(LEGACY_FRAME, pi_gpio)
+    encoder8 = PPMEncoder(PPMFrameSpec(), pi_gpio)
+    us8 = encoder8.spec.channel_us(values8)
+    bench("legacy 3ch", lambda: legacy_encode(values3), seconds)
+    bench("PPMEncoder 3ch", lambda: encoder3.encode(values3), seconds)
+    bench("PPMEncoder 8ch", lambda: encoder8.encode(values8), seconds)
+    bench("PPMEncoder 8ch (us in)", lambda: encoder8.encode_us(us8), seconds)
+
+if __name__ == "__main__":
+    main()
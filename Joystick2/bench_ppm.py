@@ -0,0 +1,208 @@
+# bench_ppm.py
+# Measures PPM update latency and pigpiod round trips per second for the old
+# wave_create/wave_delete rotation vs the double-buffered PPMOutput engine.
+# Needs a running pigpiod; don't run it while something is flying off GPIO 18.
+# --mock runs against mock_pigpio instead and also reports wave churn and how
+# long each update takes to go on air.
+# --soak runs PPMOutput for a long time against mock_pigpio with injected
+# create/send failures and checks the daemon never holds a wave the output's
+# ledger doesn't know about, nor more wave memory than the three owned waves.
+#   python bench_ppm.py [--mock] [updates]
+#   python bench_ppm.py --soak [updates]
+import sys
+import time
+from ppm import PPMOutput
+
+PPM_OUTPUT_PIN = 18
+pi_gpio = 1 << PPM_OUTPUT_PIN
+
+class CountingPi:
+    # wraps a pigpio.pi and counts every call that goes over the daemon socket
+    def __init__(self, pi):
+        self._pi = pi
+        self.calls = 0
+    def __getattr__(self, name):
+        attr = getattr(self._pi, name)
+        if not callable(attr):
+            return attr
+        def counted(*args, **kwargs):
+            self.calls += 1
+            return attr(*args, **kwargs)
+        return counted
+
+def build_pulses(pigpio, channels):
+    pulses, pos = [], 0
+    for value in channels:
+        us = int(round(1500 + 500 * value))
+        pulses += [pigpio.pulse(0, pi_gpio, 300),
+            pigpio.pulse(pi_gpio, 0, us -300)]
+        pos += us
+    pulses += [pigpio.pulse(0, pi_gpio, 300),
+           pigpio.pulse(pi_gpio, 0, 20000 - 300 - pos - 1)]
+    return pulses
+
+class SimClock:
+    # simulated time for mock runs: each update is one control tick later, so
+    # frame switching, hold-off and on-air latency behave as on the Pi
+    def __init__(self, tick_s=0.01):
+        self.now_ns = 0
+        self.tick_ns = int(tick_s * 1e9)
+    def ns(self):
+        return self.now_ns
+    def seconds(self):
+        return self.now_ns / 1e9
+    def tick(self):
+        self.now_ns += self.tick_ns
+
+def frames(n):
+    # sweep the sticks so every update is a real change
+    for i in range(n):
+        v = ((i % 200) - 100) / 100
+        yield (v, -v, v / 2)
+
+def bench_legacy(pi, pigpio, n, clock=None):
+    pi.wave_add_generic([pigpio.pulse(pi_gpio, 0, 2000)])
+    waves = [None, None, pi.wave_create()]
+    pi.wave_send_repeat(waves[-1])
+    pi.calls = 0
+    start = time.perf_counter()
+    for channels in frames(n):
+        if clock:
+            clock.tick()
+        pi.wave_add_generic(build_pulses(pigpio, channels))
+        waves.append(pi.wave_create())
+        pi.wave_send_using_mode(waves[-1], pigpio.WAVE_MODE_REPEAT_SYNC)
+        last, waves = waves[0], waves[1:]
+        if last:
+            pi.wave_delete(last)
+    elapsed = time.perf_counter() - start
+    pi.wave_tx_stop()
+    for wid in waves:
+        if wid is not None:
+            pi.wave_delete(wid)
+    return elapsed
+
+def bench_double_buffered(pi, pigpio, n, clock=None):
+    if clock:
+        output = PPMOutput(pi, pigpio, frame_us=20000, clock=clock.seconds)
+    else:
+        # frame_us=0 turns off the one-frame hold-off so every call does an update
+        output = PPMOutput(pi, pigpio, frame_us=0)
+    output.start([pigpio.pulse(pi_gpio, 0, 2000)])
+    pi.calls = 0
+    start = time.perf_counter()
+    for channels in frames(n):
+        if clock:
+            clock.tick()
+        output.update(build_pulses(pigpio, channels))
+    elapsed = time.perf_counter() - start
+    output.stop()
+    return elapsed
+
+class FaultyPi:
+    # fails every nth wave create/send the way pigpiod does: with an error and
+    # nothing created or sent (pulses already added stay queued)
+    def __init__(self, pi, pigpio, create_every=997, send_every=1499):
+        self._pi = pi
+        self.pigpio = pigpio
+        self.create_every = create_every
+        self.send_every = send_every
+        self.creates = 0
+        self.sends = 0
+        self.injected = 0
+    def __getattr__(self, name):
+        return getattr(self._pi, name)
+    def wave_create_and_pad(self, percent):
+        self.creates += 1
+        if self.creates % self.create_every == 0:
+            self.injected += 1
+            raise self.pigpio.error(self.pigpio.PI_TOO_MANY_CBS)
+        return self._pi.wave_create_and_pad(percent)
+    def wave_send_using_mode(self, wave_id, mode):
+        self.sends += 1
+        if self.sends % self.send_every == 0:
+            self.injected += 1
+            raise self.pigpio.error(self.pigpio.PI_BAD_WAVE_ID)
+        return self._pi.wave_send_using_mode(wave_id, mode)
+
+def soak(n):
+    import logging
+    import mock_pigpio as pigpio
+    logging.getLogger("ppm").setLevel(logging.ERROR) #one warning per injected failure otherwise
+    clock = SimClock()
+    real = pigpio.pi(clock=clock.ns)
+    pi = FaultyPi(real, pigpio)
+    output = PPMOutput(pi, pigpio, frame_us=20000, clock=clock.seconds)
+    output.start([pigpio.pulse(pi_gpio, 0, 2000)], clear=True)
+    mismatches = 0
+    peak_pulses = peak_cbs = 0
+    start = time.perf_counter()
+    for channels in frames(n):
+        clock.tick()
+        output.update(build_pulses(pigpio, channels))
+        # the daemon's view must match the ledger after every update
+        if set(real.waves) != set(output.waves.waves) or real.pending:
+            mismatches += 1
+        pulses, cbs = real._used()
+        peak_pulses = max(peak_pulses, pulses)
+        peak_cbs = max(peak_cbs, cbs)
+    elapsed = time.perf_counter() - start
+    usage = output.usage()
+    output.stop()
+    print(f"{n} updates in {elapsed:.1f}s ({clock.seconds():.0f}s simulated), "
+          f"{pi.injected} injected failures, {usage['errors']} failed updates, "
+          f"{usage['reclaimed']} waves reclaimed")
+    print(f"peak waves {real.peak_waves}, peak pulses {peak_pulses}/{pigpio.MAX_PULSES}, "
+          f"peak cbs {peak_cbs}/{pigpio.MAX_CBS}, deleted while on air {real.deleted_on_air}")
+    print(f"ledger/daemon mismatches {mismatches}, waves left after stop {len(real.waves)}")
+    if mismatches or real.waves or real.peak_waves > 3:
+        sys.exit("wave leak")
+
+def report(name, pi, elapsed, n):
+    print(f"{name:16} {elapsed / n * 1e6:9.1f} us/update  "
+          f"{pi.calls / n:4.1f} calls/update  {pi.calls / elapsed:9.0f} calls/s")
+
+def report_mock(real):
+    latencies = sorted(real.latencies_ns())
+    if latencies:
+        print(f"{'':16} on air after {latencies[len(latencies) // 2] / 1e3:.0f} us median, "
+              f"{latencies[-1] / 1e3:.0f} us max")
+    print(f"{'':16} waves created {real.created}, deleted {real.deleted}, "
+          f"deleted while on air {real.deleted_on_air}, peak ids in use {real.peak_waves}")
+
+def main():
+    args = sys.argv[1:]
+    mock = "--mock" in args
+    if "--soak" in args:
+        args = [a for a in args if a != "--soak"]
+        soak(int(args[0]) if args else 200000)
+        return
+    args = [a for a in args if a != "--mock"]
+    n = int(args[0]) if args else 1000
+    if mock:
+        import mock_pigpio as pigpio
+    else:
+        try:
+            import pigpio
+        except ImportError:
+            sys.exit("pigpio not installed (try --mock)")
+    if mock:
+        # fresh daemon per engine so churn numbers aren't mixed up
+        for name, bench in (("legacy", bench_legacy), ("double-buffered", bench_double_buffered)):
+            clock = SimClock()
+            real = pigpio.pi(clock=clock.ns)
+            pi = CountingPi(real)
+            report(name, pi, bench(pi, pigpio, n, clock), n)
+            report_mock(real)
+        return
+    real = pigpio.pi()
+    if not real.connected:
+        sys.exit("can't connect to pigpiod")
+    pi = CountingPi(real)
+    pi.set_mode(PPM_OUTPUT_PIN, pigpio.OUTPUT)
+    report("legacy", pi, bench_legacy(pi, pigpio, n), n)
+    report("double-buffered", pi, bench_double_buffered(pi, pigpio, n), n)
+    real.stop()
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 # config.py
-# import os
+import os
 import platform
 import logging
 logger = logging.getLogger(__name__)
@@ -7,16 +7,6 @@ logger = logging.getLogger(__name__)
 # print(platform.system().lower())
 
 config_windows = {
-    "DDRPad_Gimbal": {
-    "up": 0,
-    "down": 1,
-    "left": 2,
-    "right": 3,
-    "X": 6,
-    "O": 7,
-    "back": 8,
-    "select": 9,
-    },
     "Drum_Gimbal": {
     "red": 2,
     "circle": 2,
@@ -44,11 +34,6 @@ config_windows = {
     "select": 8,
     "start": 9,
     },
-    "Xbox360_Gimbal": {
-    "left_trigger": 4,
-    "right_gimbal_LR": 2,
-    "right_gimbal_UD": 3,
-    },
     "Guitar_Gimbal": {
     "green": 1,
     "red": 0,
@@ -62,16 +47,6 @@ config_windows = {
 }
 
 config_linux = {
-    "DDRPad_Gimbal": { #same
-    "up": 0,
-    "down": 1,
-    "left": 2,
-    "right": 3,
-    "X": 6,
-    "O": 7,
-    "back": 8,
-    "select": 9,
-    },
     "Drum_Gimbal": { #same
     "red": 2,
     "circle": 2,
@@ -100,11 +75,6 @@ config_linux = {
     "select": 8,
     "start": 9,
     },
-    "Xbox360_Gimbal": { #done
-    "left_trigger": 2,
-    "right_gimbal_LR": 3,
-    "right_gimbal_UD": 4,
-    },
     "Guitar_Gimbal": { #same
     "green": 1,
     "red": 0,
@@ -140,25 +110,43 @@ config_macos = { #todo
 #             pass
 #     return "Unknown"
 
+_system = None
+
+def get_system():
+    # platform.system() is only asked once per process, every gimbal
+    # constructor used to call it up to three times
+    global _system
+    if _system is None:
+        _system = platform.system().lower()
+    return _system
+
 def get_config():
-    if platform.system().lower() == "windows":
+    system = get_system()
+    if system == "windows":
         return config_windows
-    elif platform.system().lower() == "darwin":
+    elif system == "darwin":
         return config_macos
-    elif platform.system().lower() == "linux":
+    elif system == "linux":
         return config_linux
     else:
         # or raise an exception
         return config_linux
 
 def get_GPIO():
-    if platform.system().lower() == "windows":
+    # JOYSTICK_MOCK_PIGPIO=1 swaps in the local pigpio stand-in so the whole
+    # output path runs (and can be measured) on a box without pigpiod
+    if os.environ.get("JOYSTICK_MOCK_PIGPIO"):
+        import mock_pigpio
+        logging.warning("using mock pigpio daemon")
+        return mock_pigpio
+    system = get_system()
+    if system == "windows":
         logging.warning("pigpio library not availale on Windows, running in debug mode")
         return None
-    elif platform.system().lower() == "darwin":
+    elif system == "darwin":
         logging.warning("pigpio library not availale on MacOS, running in debug mode")
         return None
-    elif platform.system().lower() == "linux":
+    elif system == "linux":
         try:
             import pigpio
             logging.warning("pigpio successfully loaded")
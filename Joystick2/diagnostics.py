@@ -0,0 +1,67 @@
+# diagnostics.py
+# Cheap redraws for the diagnostics window. font.render is the expensive bit
+# on a Pi, and almost every line (labels, idle axes, released buttons) is the
+# same as last frame, so rendered text is cached and only lines that changed
+# are repainted and pushed with pygame.display.update(rects).
+from collections import OrderedDict
+import pygame
+
+class TextCache:
+    # LRU of rendered surfaces keyed by the exact text, i.e. label + formatted
+    # value ("Axis 2: 0.031"), so a value only renders again when it changes
+    def __init__(self, font, color=(0, 0, 0), max_entries=512):
+        self.font = font
+        self.color = color
+        self.max_entries = max_entries
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, text):
+        surface = self.surfaces.get(text)
+        if surface is not None:
+            self.surfaces.move_to_end(text)
+            self.hits += 1
+            return surface
+        self.misses += 1
+        surface = self.font.render(text, True, self.color)
+        self.surfaces[text] = surface
+        if len(self.surfaces) > self.max_entries:
+            self.surfaces.popitem(last=False)
+        return surface
+
+class DiagnosticsPanel:
+    def __init__(self, screen, font, background=(255, 255, 255)):
+        self.screen = screen
+        self.background = background
+        self.text = TextCache(font)
+        self.lines = [] #(text, pos, rect) currently on screen
+        self.full_redraw = True
+
+    def invalidate(self):
+        # window resized/exposed or the layout changed, repaint everything
+        self.full_redraw = True
+
+    def draw(self, lines):
+        # lines: list of (text, (x, y))
+        if self.full_redraw or len(lines) != len(self.lines):
+            self.screen.fill(self.background)
+            self.lines = []
+            for text, pos in lines:
+                surface = self.text.render(text)
+                self.lines.append((text, pos, self.screen.blit(surface, pos)))
+            pygame.display.flip()
+            self.full_redraw = False
+            return
+
+        dirty = []
+        for i, (text, pos) in enumerate(lines):
+            old_text, old_pos, old_rect = self.lines[i]
+            if text == old_text and pos == old_pos:
+                continue
+            self.screen.fill(self.background, old_rect)
+            rect = self.screen.blit(self.text.render(text), pos)
+            self.lines[i] = (text, pos, rect)
+            dirty.append(old_rect.union(rect))
+        if dirty:
+            pygame.display.update(dirty)
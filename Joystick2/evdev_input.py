@@ -0,0 +1,364 @@
+# evdev_input.py
+# Linux input backend that reads /dev/input/event* directly, no pygame/SDL.
+# Each device is a non-blocking fd; EvdevBackend waits on all of them with a
+# selector (epoll on Linux), or hand fileno()/read() of each EvdevJoystick to
+# asyncio's loop.add_reader.
+#
+# EvdevJoystick has the pygame.joystick.Joystick surface JoystickState is
+# built from, with axes, buttons and hats numbered the way SDL numbers them
+# on Linux so the config.py indices stay valid:
+#   axes     ABS codes in order, hat codes skipped, scaled to -1.0..1.0
+#   buttons  BTN_JOYSTICK..KEY_MAX, then BTN_MISC..BTN_JOYSTICK
+#   hats     (x, y) from ABS_HAT0X/ABS_HAT0Y..ABS_HAT3X/ABS_HAT3Y, y up = +1 like pygame
+#
+# Decoding is separate from the fd, so a device can be built from a
+# capability description and fed fixture bytes (see pack_events) without
+# uinput or any hardware:
+#   js = EvdevJoystick(0, "pad", "", {ABS_X: (0, -32768, 32767)}, {BTN_A: 0})
+#   js.feed(pack_events([(EV_ABS, ABS_X, 32767), (EV_SYN, SYN_REPORT, 0)]))
+# `python evdev_input.py check` runs the fixture checks in check().
+import os
+import sys
+import glob
+import errno
+import struct
+import selectors
+import time
+import logging
+from input_state import JoystickSurface
+logger = logging.getLogger(__name__)
+try:
+    import fcntl
+except ImportError: #not on Windows, where this backend is no use anyway
+    fcntl = None
+
+EVENT = struct.Struct("llHHi") #struct input_event: timeval, type, code, value
+ABSINFO = struct.Struct("6i") #struct input_absinfo: value, min, max, fuzz, flat, resolution
+INPUT_ID = struct.Struct("4H") #struct input_id: bustype, vendor, product, version
+
+EV_SYN, EV_KEY, EV_ABS = 0x00, 0x01, 0x03
+SYN_REPORT, SYN_DROPPED = 0, 3
+ABS_X, ABS_Y = 0x00, 0x01
+ABS_HAT0X, ABS_HAT0Y, ABS_HAT3Y = 0x10, 0x11, 0x17
+ABS_MAX = 0x3f
+BTN_MISC, BTN_JOYSTICK, BTN_A, BTN_DIGI = 0x100, 0x120, 0x130, 0x140
+BTN_TRIGGER_HAPPY = 0x2c0
+KEY_MAX = 0x2ff
+CLOCK_MONOTONIC = 1
+READ_EVENTS = 64 #events per read() call
+
+def _ioc(direction, nr, size):
+    return direction << 30 | size << 16 | ord("E") << 8 | nr
+def EVIOCGNAME(length):
+    return _ioc(2, 0x06, length)
+def EVIOCGKEY(length):
+    return _ioc(2, 0x18, length)
+def EVIOCGBIT(ev, length):
+    return _ioc(2, 0x20 + ev, length)
+def EVIOCGABS(code):
+    return _ioc(2, 0x40 + code, ABSINFO.size)
+EVIOCGID = _ioc(2, 0x02, INPUT_ID.size)
+EVIOCSCLOCKID = _ioc(1, 0xa0, 4)
+
+def pack_events(events, t_ns=0):
+    # [(type, code, value), ...] -> raw bytes as read from an event device
+    sec, usec = divmod(t_ns // 1000, 1_000_000)
+    return b"".join(EVENT.pack(sec, usec, kind, code, value) for kind, code, value in events)
+
+def sdl_guid(bustype, vendor, product, version):
+    # SDL 2's GUID for a Linux joystick with vendor/product ids, as hex
+    return struct.pack("<8H", bustype, 0, vendor, 0, product, 0, version, 0).hex()
+
+def _bits(data):
+    # bitmask bytes from EVIOCGBIT/EVIOCGKEY -> set bit numbers
+    return {i * 8 + b for i, byte in enumerate(data) for b in range(8) if byte >> b & 1}
+
+def _ioctl(fd, request, size):
+    return fcntl.ioctl(fd, request, bytes(size))
+
+def is_joystick(keys):
+    # has joystick/gamepad buttons: not a keyboard, mouse, touchpad or a
+    # pad's separate motion sensor node. Sticks, pads, wheels and dance
+    # mats all qualify.
+    return any(BTN_JOYSTICK <= k < BTN_DIGI or k >= BTN_TRIGGER_HAPPY for k in keys)
+
+class EvdevJoystick(JoystickSurface):
+    def __init__(self, jid, name, guid, absinfo, keys, fd=None, path=None):
+        # absinfo: {abs code: (value, min, max)}, keys: {key code: pressed}
+        self.jid = jid
+        self.name = name
+        self.guid = guid
+        self.fd = fd
+        self.path = path
+        self.state = None #JoystickState to forward changes to, see attach()
+        self.recorder = None #InputRecorder, optional
+        self.last_event_ns = 0 #kernel timestamp of the latest event (monotonic when we set the clock)
+        self.dropping = False #after SYN_DROPPED until the next SYN_REPORT
+        self.abs_codes = tuple(absinfo)
+
+        self.axis_map = {} #abs code -> (axis index, min, scale)
+        self.hat_map = {} #abs code -> (hat index, 0 for x / 1 for y)
+        self.button_map = {} #key code -> button index
+        self.axes, self.hats, self.buttons = [], [], []
+        for code in sorted(absinfo):
+            if ABS_HAT0X <= code <= ABS_HAT3Y:
+                continue
+            _, lo, hi = absinfo[code]
+            self.axis_map[code] = (len(self.axes), lo, 2.0 / (hi - lo) if hi > lo else 0.0)
+            self.axes.append(0.0)
+        for hat in range((ABS_HAT3Y - ABS_HAT0X + 1) // 2):
+            x, y = ABS_HAT0X + 2 * hat, ABS_HAT0X + 2 * hat + 1
+            if x in absinfo or y in absinfo:
+                self.hat_map[x] = (len(self.hats), 0)
+                self.hat_map[y] = (len(self.hats), 1)
+                self.hats.append((0, 0))
+        ordered = sorted(k for k in keys if k >= BTN_JOYSTICK) + sorted(k for k in keys if BTN_MISC <= k < BTN_JOYSTICK)
+        for code in ordered:
+            self.button_map[code] = len(self.buttons)
+            self.buttons.append(0)
+        self._seed(absinfo, keys)
+
+    def _seed(self, absinfo, keys):
+        for code, (value, _, _) in absinfo.items():
+            self._apply(EV_ABS, code, value)
+        for code, pressed in keys.items():
+            self._apply(EV_KEY, code, pressed)
+
+    def attach(self, state):
+        # from here on every change also goes to state (a JoystickState)
+        self.state = state
+
+    def fileno(self):
+        return self.fd
+
+    def _apply(self, kind, code, value):
+        if kind == EV_ABS:
+            if code in self.axis_map:
+                i, lo, scale = self.axis_map[code]
+                value = (value - lo) * scale - 1.0 if scale else 0.0
+                value = -1.0 if value < -1.0 else 1.0 if value > 1.0 else value
+                if self.axes[i] == value:
+                    return
+                self.axes[i] = value
+                if self.state:
+                    self.state.set_axis(i, value)
+                if self.recorder:
+                    self.recorder.axis(self.jid, i, value)
+            elif code in self.hat_map:
+                i, axis = self.hat_map[code]
+                value = (value > 0) - (value < 0)
+                x, y = self.hats[i]
+                hat = (value, y) if axis == 0 else (x, -value)
+                if self.hats[i] == hat:
+                    return
+                self.hats[i] = hat
+                if self.state:
+                    self.state.set_hat(i, hat)
+                if self.recorder:
+                    self.recorder.hat(self.jid, i, hat)
+        elif kind == EV_KEY and code in self.button_map:
+            i = self.button_map[code]
+            value = 1 if value else 0 #2 is autorepeat, still held
+            if self.buttons[i] == value:
+                return
+            self.buttons[i] = value
+            if self.state:
+                self.state.set_button(i, value)
+            if self.recorder:
+                self.recorder.button(self.jid, i, value)
+
+    def feed(self, data):
+        # apply raw input_event bytes. -> number of events decoded
+        n = 0
+        for sec, usec, kind, code, value in EVENT.iter_unpack(data):
+            n += 1
+            if kind == EV_SYN:
+                if code == SYN_DROPPED:
+                    # kernel buffer overran, the events up to the next report
+                    # are incomplete: drop them and re-read the whole state
+                    self.dropping = True
+                elif code == SYN_REPORT:
+                    self.last_event_ns = sec * 1_000_000_000 + usec * 1000
+                    if self.dropping:
+                        self.dropping = False
+                        self.resync()
+            elif not self.dropping:
+                self._apply(kind, code, value)
+        return n
+
+    def read(self):
+        # drain the non-blocking fd. -> False once the device is gone
+        while True:
+            try:
+                data = os.read(self.fd, EVENT.size * READ_EVENTS)
+            except BlockingIOError:
+                return True
+            except OSError as e:
+                if e.errno in (errno.ENODEV, errno.EIO):
+                    return False
+                raise
+            if not data:
+                return False
+            self.feed(data)
+            if len(data) < EVENT.size * READ_EVENTS:
+                return True
+
+    def resync(self):
+        if self.fd is None:
+            return
+        absinfo = {code: ABSINFO.unpack(_ioctl(self.fd, EVIOCGABS(code), ABSINFO.size))[:3]
+                   for code in self.abs_codes}
+        pressed = _bits(_ioctl(self.fd, EVIOCGKEY((KEY_MAX + 8) // 8), (KEY_MAX + 8) // 8))
+        self._seed(absinfo, {code: int(code in pressed) for code in self.button_map})
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+def open_device(path, jid):
+    # -> EvdevJoystick, or None if path isn't a joystick. Raises OSError if
+    # it can't be opened (permissions: add the user to the input group)
+    fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+    try:
+        ev_bits = _bits(_ioctl(fd, EVIOCGBIT(0, 4), 4))
+        keys = set()
+        if EV_KEY in ev_bits:
+            keys = _bits(_ioctl(fd, EVIOCGBIT(EV_KEY, (KEY_MAX + 8) // 8), (KEY_MAX + 8) // 8))
+        abs_codes = set()
+        if EV_ABS in ev_bits:
+            abs_codes = _bits(_ioctl(fd, EVIOCGBIT(EV_ABS, (ABS_MAX + 8) // 8), (ABS_MAX + 8) // 8))
+        absinfo = {code: ABSINFO.unpack(_ioctl(fd, EVIOCGABS(code), ABSINFO.size))[:3] for code in abs_codes}
+        if not is_joystick(keys):
+            os.close(fd)
+            return None
+        name = _ioctl(fd, EVIOCGNAME(256), 256).split(b"\0", 1)[0].decode(errors="replace")
+        guid = sdl_guid(*INPUT_ID.unpack(_ioctl(fd, EVIOCGID, INPUT_ID.size)))
+        pressed = _bits(_ioctl(fd, EVIOCGKEY((KEY_MAX + 8) // 8), (KEY_MAX + 8) // 8))
+        try:
+            fcntl.ioctl(fd, EVIOCSCLOCKID, struct.pack("i", CLOCK_MONOTONIC)) #timestamps comparable to monotonic_ns
+        except OSError:
+            pass
+    except BaseException:
+        os.close(fd)
+        raise
+    return EvdevJoystick(jid, name, guid, absinfo, {k: int(k in pressed) for k in keys}, fd=fd, path=path)
+
+class EvdevBackend:
+    # hotplug by rescanning the device directory every rescan_s; paths that
+    # aren't joysticks are remembered so they're only probed once. A node that
+    # can't be opened is retried every scan: right after hotplug udev often
+    # hasn't applied its group/mode yet, so the first open gets EACCES.
+    def __init__(self, on_add, on_remove, pattern="/dev/input/event*", rescan_s=1.0,
+                 warn_every_s=30.0):
+        self.on_add = on_add #fn(EvdevJoystick)
+        self.on_remove = on_remove #fn(jid)
+        self.pattern = pattern
+        self.rescan_s = rescan_s
+        self.selector = selectors.DefaultSelector()
+        self.devices = {} #path -> EvdevJoystick
+        self.ignored = set()
+        self.failing = {} #path -> monotonic time its open error may be logged again
+        self.warn_every_s = warn_every_s
+        self.next_jid = 0
+        self.next_scan = 0.0
+
+    def scan(self):
+        paths = set(glob.glob(self.pattern))
+        self.ignored &= paths
+        for path in set(self.failing) - paths:
+            del self.failing[path]
+        for path in sorted(paths - self.ignored - set(self.devices)):
+            try:
+                joystick = open_device(path, self.next_jid)
+            except OSError as e:
+                now = time.monotonic()
+                if now >= self.failing.get(path, 0.0):
+                    logger.warning("can't open %s: %s", path, e)
+                    self.failing[path] = now + self.warn_every_s
+                continue
+            self.failing.pop(path, None)
+            if joystick is None:
+                self.ignored.add(path)
+                continue
+            self.next_jid += 1
+            self.devices[path] = joystick
+            self.selector.register(joystick.fd, selectors.EVENT_READ, joystick)
+            self.on_add(joystick)
+        for path in set(self.devices) - paths:
+            self._remove(self.devices[path])
+
+    def _remove(self, joystick):
+        del self.devices[joystick.path]
+        self.selector.unregister(joystick.fd)
+        joystick.close()
+        self.on_remove(joystick.jid)
+
+    def poll(self, timeout):
+        # wait up to timeout seconds for input and apply it. -> joysticks that had input
+        now = time.monotonic()
+        if now >= self.next_scan:
+            self.scan()
+            self.next_scan = now + self.rescan_s
+        timeout = max(0.0, min(timeout, self.next_scan - now))
+        if not self.devices:
+            time.sleep(timeout) #nothing to select on
+            return []
+        ready = []
+        for key, _ in self.selector.select(timeout):
+            joystick = key.data
+            if joystick.read():
+                ready.append(joystick)
+            else:
+                self._remove(joystick)
+        return ready
+
+    def close(self):
+        for joystick in list(self.devices.values()):
+            self._remove(joystick)
+        self.selector.close()
+
+def check():
+    # decoding against fixture event streams, no device needed. Raises
+    # AssertionError on the first mismatch.
+    ABS_Z = 0x02
+    BTN_B = BTN_A + 1
+    report = (EV_SYN, SYN_REPORT, 0)
+    js = EvdevJoystick(0, "pad", "", {ABS_X: (0, -32768, 32767), ABS_Z: (0, 0, 255),
+                                      ABS_HAT0X: (0, -1, 1), ABS_HAT0Y: (0, -1, 1)},
+                       {BTN_MISC: 0, BTN_B: 0, BTN_A: 0})
+    # axes: hat codes skipped, full range scaled to -1..1
+    assert js.get_numaxes() == 2 and js.get_numhats() == 1
+    js.feed(pack_events([(EV_ABS, ABS_X, 32767), (EV_ABS, ABS_Z, 0), report]))
+    assert js.get_axis(0) == 1.0 and js.get_axis(1) == -1.0, js.axes
+    js.feed(pack_events([(EV_ABS, ABS_X, -32768), (EV_ABS, ABS_Z, 255), report]))
+    assert js.get_axis(0) == -1.0 and js.get_axis(1) == 1.0, js.axes
+    # buttons: BTN_JOYSTICK and up first, then BTN_MISC..BTN_JOYSTICK, like SDL
+    js.feed(pack_events([(EV_KEY, BTN_B, 1), report]))
+    assert js.buttons == [0, 1, 0], js.buttons
+    js.feed(pack_events([(EV_KEY, BTN_MISC, 2), report])) #autorepeat reads as held
+    assert js.buttons == [0, 1, 1], js.buttons
+    # hats: evdev y is down = +1, pygame's is up = +1
+    js.feed(pack_events([(EV_ABS, ABS_HAT0X, 1), (EV_ABS, ABS_HAT0Y, -1), report]))
+    assert js.get_hat(0) == (1, 1), js.hats
+    js.feed(pack_events([(EV_ABS, ABS_HAT0Y, 1), report]))
+    assert js.get_hat(0) == (1, -1), js.hats
+    # SYN_DROPPED: everything up to the next report is ignored, then the
+    # state is re-read (nothing to re-read without an fd, so it stays put)
+    js.feed(pack_events([(EV_SYN, SYN_DROPPED, 0), (EV_KEY, BTN_A, 1), (EV_ABS, ABS_X, 0), report]))
+    assert js.buttons == [0, 1, 1] and js.get_axis(0) == -1.0 and not js.dropping
+    js.feed(pack_events([(EV_KEY, BTN_A, 1), report]))
+    assert js.buttons == [1, 1, 1], js.buttons
+    # timestamps come from the SYN_REPORT
+    js.feed(pack_events([report], t_ns=1_500_000_000))
+    assert js.last_event_ns == 1_500_000_000
+    assert sdl_guid(3, 0x045e, 0x028e, 0x0114) == "030000005e0400008e02000014010000"
+
+def main():
+    if sys.argv[1:] != ["check"]:
+        sys.exit("usage: python evdev_input.py check")
+    check()
+    print("evdev decoding ok")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+# filters.py
+# Stick shaping shared by the gimbal classes and compiled device profiles:
+# calibration remaps and the hold/hit pressure integrators.
+import time
+from collections import deque
+
+# Constants for hit-based pressure
+HIT_WINDOW = 1.0  # Seconds to track hits
+MAX_HITS = 10     # Maximum hits per second for full pressure
+
+# Pressure filters integrate over real elapsed time: growth/decay rates are in
+# units per second and every update takes the tick's dt, so changing
+# CONTROL_RATE_HZ doesn't change how fast the sticks ramp.
+# (old per-frame rates were tuned at 30 Hz, per-second = per-frame * 30)
+MAX_DT = 0.1 #clamp after a stall so one late tick can't slam a stick over
+
+def remap(num, inMin, inMax, inMid, outMin, outMax, outMid):
+    
+    # Calculate the input and output ranges
+    inRange = inMax - inMin
+    outRange = outMax - outMin
+    
+    # Calculate the input and output midpoints
+    inMidRange = inMid - inMin
+    outMidRange = outMid - outMin
+    
+    # Determine the input and output halves
+    if num <= inMid:
+        # Map the lower half
+        remapped_value = outMid - (inMid - num) / inMidRange * outMidRange
+    else:
+        # Map the upper half
+        remapped_value = outMid + (num - inMid) / (inRange - inMidRange) * (outRange - outMidRange)
+    
+    # Ensure the remapped value is within the output range
+    remapped_value = max(outMin, min(remapped_value, outMax))
+    
+    return remapped_value
+
+# remap() with everything but num worked out up front. Built once when a
+# gimbal is constructed, so a tick is one compare, one multiply-add and a clamp.
+class AxisCalibration:
+    __slots__ = ("inMid", "lo_slope", "lo_offset", "hi_slope", "hi_offset", "outMin", "outMax")
+    def __init__(self, inMin, inMax, inMid, outMin, outMax, outMid):
+        inMidRange = inMid - inMin
+        inUpperRange = inMax - inMid
+        if inMidRange == 0 or inUpperRange == 0:
+            raise ValueError(f"calibration mid {inMid} must sit strictly between {inMin} and {inMax}")
+        self.inMid = inMid
+        # same two half-line maps as remap(), as slope/offset pairs
+        self.lo_slope = (outMid - outMin) / inMidRange
+        self.lo_offset = outMid - inMid * self.lo_slope
+        self.hi_slope = (outMax - outMid) / inUpperRange
+        self.hi_offset = outMid - inMid * self.hi_slope
+        self.outMin = outMin
+        self.outMax = outMax
+
+    def __call__(self, num):
+        if num <= self.inMid:
+            value = self.lo_offset + num * self.lo_slope
+        else:
+            value = self.hi_offset + num * self.hi_slope
+        # Ensure the remapped value is within the output range
+        if value < self.outMin:
+            return self.outMin
+        if value > self.outMax:
+            return self.outMax
+        return value
+
+# calibrate several axes of one device in one go. calibrations is a tuple of
+# (axis index, AxisCalibration) and axes anything indexable, e.g. the
+# JoystickState.axes list
+def calibrate_axes(calibrations, axes):
+    return [cal(axes[i]) for i, cal in calibrations]
+
+def update_hold_pressure(pressure, positive_input, negative_input, max_force, growth_rate, decay_rate, dt):
+    growth_rate *= dt
+    decay_rate *= dt
+    if positive_input:
+        pressure = min(max_force, pressure + growth_rate)
+    elif negative_input:
+        pressure = max(-max_force, pressure - growth_rate)
+    else:
+        if pressure > 0:
+            pressure = max(0, pressure - decay_rate)
+        elif pressure < 0:
+            pressure = min(0, pressure + decay_rate)
+    return pressure
+
+def update_hold_pressure_multi(pressure, positive_input, negative_input, max_force, growth_rate, decay_rate, last_pressed_direction, dt):
+    growth_rate *= dt
+    decay_rate *= dt
+    if positive_input and negative_input:
+        if last_pressed_direction == 'positive':
+            pressure = min(max_force, pressure + growth_rate)
+        elif last_pressed_direction == 'negative':
+            pressure = max(-max_force, pressure - growth_rate)
+    elif positive_input:
+        pressure = min(max_force, pressure + growth_rate)
+        last_pressed_direction = 'negative'
+    elif negative_input:
+        pressure = max(-max_force, pressure - growth_rate)
+        last_pressed_direction = 'positive'
+    else:
+        if pressure > 0:
+            pressure = max(0, pressure - decay_rate)
+        elif pressure < 0:
+            pressure = min(0, pressure + decay_rate)
+        last_pressed_direction = None #reset last pressed direction when nothing is pressed
+    return pressure, last_pressed_direction
+
+# Counts distinct hits (press edges, not held frames) inside a sliding window.
+# Timestamps live in a deque capped at max_hits - density saturates at 1.0
+# there anyway - and expire from the left, so each update is amortised O(1)
+# however hard the pad is being hammered.
+class HitRateTracker:
+    def __init__(self, window=HIT_WINDOW, max_hits=MAX_HITS):
+        self.window_ns = int(window * 1e9)
+        self.max_hits = max_hits
+        self.hits = deque(maxlen=max_hits)
+        self.was_pressed = False
+
+    def update(self, pressed, now_ns=None) -> float:
+        if now_ns is None:
+            now_ns = time.monotonic_ns()
+        hits = self.hits
+        while hits and now_ns - hits[0] > self.window_ns:
+            hits.popleft()
+        if pressed and not self.was_pressed:
+            hits.append(now_ns)
+        self.was_pressed = bool(pressed)
+        return len(hits) / self.max_hits #hit density, 0.0-1.0
+
+def update_hit_pressure(pressure, positive_input, negative_input, max_force, growth_rate, decay_rate, hit_tracker, dt, now_ns=None):
+    growth_rate *= dt
+    decay_rate *= dt
+    hit_density = hit_tracker.update(positive_input, now_ns)
+
+    if positive_input:
+        pressure = min(max_force, pressure + growth_rate)
+    elif negative_input:
+        # No timestamps added here for negative input.
+        pressure = max(-max_force, pressure - growth_rate)
+    else:
+        if pressure > 0:
+            pressure = max(0, pressure - decay_rate)
+        elif pressure < 0:
+            pressure = min(0, pressure + decay_rate)
+
+    if pressure > 0:
+        pressure = min(pressure, hit_density * max_force)
+    elif pressure < 0:
+        # Negative pressure is not affected by hit density.
+        pass
+
+    return pressure
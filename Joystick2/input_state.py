@@ -0,0 +1,63 @@
+# input_state.py
+# Per-joystick input cache fed from pygame's JOYAXISMOTION / JOYBUTTONDOWN /
+# JOYBUTTONUP / JOYHATMOTION events. Gimbals read plain lists instead of
+# making an SDL call per button per tick.
+import threading
+
+# set by the event thread whenever any cached input changes, so the control
+# loop can wake up straight away instead of waiting for its next tick
+input_changed = threading.Event()
+
+class JoystickSurface:
+    # the pygame.joystick.Joystick getters over plain attributes: jid, name,
+    # guid and the axes/buttons/hats lists. Shared by everything that stands
+    # in for a pygame joystick (the cache below, evdev devices, replays).
+    def init(self):
+        pass
+    def quit(self):
+        pass
+    def get_init(self):
+        return True
+    def get_instance_id(self):
+        return self.jid
+    def get_name(self):
+        return self.name
+    def get_guid(self):
+        return self.guid
+    def get_numaxes(self):
+        return len(self.axes)
+    def get_numbuttons(self):
+        return len(self.buttons)
+    def get_numhats(self):
+        return len(self.hats)
+    def get_axis(self, i):
+        return self.axes[i]
+    def get_button(self, i):
+        return self.buttons[i]
+    def get_hat(self, i):
+        return self.hats[i]
+
+class JoystickState(JoystickSurface):
+    # same get_* surface SimGimbal uses on pygame.joystick.Joystick
+    def __init__(self, joystick):
+        self.joystick = joystick
+        self.jid = joystick.get_instance_id()
+        self.name = joystick.get_name()
+        self.guid = joystick.get_guid() if hasattr(joystick, "get_guid") else "" #pygame 2+
+        # seed from the device once, events keep it current afterwards
+        self.axes = [joystick.get_axis(i) for i in range(joystick.get_numaxes())]
+        self.buttons = [joystick.get_button(i) for i in range(joystick.get_numbuttons())]
+        self.hats = [joystick.get_hat(i) for i in range(joystick.get_numhats())]
+
+    def set_axis(self, i, value):
+        if self.axes[i] != value:
+            self.axes[i] = value
+            input_changed.set()
+    def set_button(self, i, value):
+        if self.buttons[i] != value:
+            self.buttons[i] = value
+            input_changed.set()
+    def set_hat(self, i, value):
+        if self.hats[i] != value:
+            self.hats[i] = value
+            input_changed.set()
@@ -1,126 +1,135 @@
-import pygame
-import json #to load config
-import sys #to load config
-print(sys.path)
-import platform #to check OS
+from __future__ import annotations #gimbal type hints name pygame without importing it
 import time
+STARTUP_T0 = time.perf_counter() #for the startup report, as early as possible
+import os
+import argparse
+import threading
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING
 from config import get_config, get_GPIO #local config
+from input_state import JoystickState, input_changed
+from ppm import PPMOutput, PPMFrameSpec, PPMEncoder, PPMUpdateFilter
+from status import serve_status
+from mixer import ChannelMixer, MIX_MODES
+from profiles import load_profiles, ProfileError
+from registry import GimbalRegistry
+from recording import InputRecorder
+from telemetry import TelemetryWriter, MIXED
+from metrics import Metrics, install_dump_signal
+from scheduler import DeadlineScheduler, setup_realtime_thread
+from watchdog import FailsafeWatchdog
+from evdev_input import EvdevBackend
+from runtime import Topic, run_tasks
+from filters import (MAX_DT, AxisCalibration, calibrate_axes, update_hold_pressure,
+                     HitRateTracker, update_hit_pressure)
+if TYPE_CHECKING:
+    import pygame
+
+# pygame and pigpio are the slow imports, both are deferred to main() /
+# connect_gpio() so the gimbal code can be imported (replay, benchmarks)
+# without either, and the PPM output doesn't wait on SDL to come up
+pygame = None
 
 #GPIO Stuff
-pigpio = get_GPIO() #launch pigpio if Linux & return True, else return False
+pigpio = None #pigpio module (or mock_pigpio) once connect_gpio() has loaded it
 PPM_OUTPUT_PIN = 18  #tip
 # RING1_PIN already ground for TRRS
 RING2_PIN = 23 #aka RING for TRS
 SLEEVE_PIN = 24
 
 pi_gpio = 1 << PPM_OUTPUT_PIN
-_output = ()
-CHANNELS = ()
-prev = None
-
-if pigpio: #if pigpio loaded
-    print("pigpio LOADED!!!")
-    pi = pigpio.pi() #pi accesses the loacl Pi's GPIO pins
-    pi.set_mode(PPM_OUTPUT_PIN, pigpio.OUTPUT) #set GPIO 18 as output
+pi = None
+ppm_output = None
+gpio_state = "connecting" #-> "ready" (pigpiod up, PPM running) or "debug" (no pigpio)
+
+# TAER + 4 aux, standard 22.5ms frame. Shorten frame_us (down to
+# channels * max_us + min_gap_us) if the receiver copes with faster frames.
+PPM_FRAME = PPMFrameSpec(channels=8, frame_us=22500, sync_us=300)
+ppm_encoder = PPMEncoder(PPM_FRAME, pi_gpio)
+# analog sticks jitter by a few us at rest; 2us either way is below anything a
+# receiver resolves, throttle gets none so arming/off is never swallowed
+ppm_filter = PPMUpdateFilter(deadband_us=(0, 2, 2, 2, 2, 2, 2, 2), min_interval_s=0.0)
+FAILSAFE_CHANNELS = (-1, 0, 0, 0) #throttle off, sticks centered, aux centered
+# fall back to the failsafe frame if the control loop produces no frame (no
+# joystick, stalled) or the UI thread stops pumping SDL events for this long
+FAILSAFE_TIMEOUT_S = 0.25
+
+# pigpiod connection retry: 0.1s, 0.2s, 0.4s ... capped at GPIO_RETRY_MAX_S.
+# The failsafe frame should be on air within GPIO_DEADLINE_S of boot; if it
+# isn't we say so loudly but keep trying.
+GPIO_RETRY_START_S = 0.1
+GPIO_RETRY_MAX_S = 2.0
+GPIO_DEADLINE_S = 5.0
+
+def startup_mark(name):
+    # one line per startup milestone, ms since the process started running us
+    print(f"[startup] {(time.perf_counter() - STARTUP_T0) * 1000:8.1f} ms  {name}")
+
+def start_output(candidate, module):
+    # pins + failsafe frame on a connected pigpio.pi -> running PPMOutput
+    startup_mark("pigpiod connected")
+    candidate.set_mode(PPM_OUTPUT_PIN, module.OUTPUT) #set GPIO 18 as output
     #force ring and sleeve pins to ground
-    pi.set_mode(RING2_PIN, pigpio.OUTPUT)
-    pi.set_mode(SLEEVE_PIN, pigpio.OUTPUT)
-    pi.write(RING2_PIN, 0)
-    pi.write(SLEEVE_PIN,0)
-    
-    pi.wave_add_generic([pigpio.pulse(pi_gpio, 0, 2000)]) #pulse(pin to turn on, pin to turn off, delay)
-    # padding to make deleting logic easier
-    waves = [None, None, pi.wave_create()]
-    pi.wave_send_repeat(waves[-1])
-else:
-    pi = None
-
-
-# Constants for hit-based pressure
-HIT_WINDOW = 1.0  # Seconds to track hits
-MAX_HITS = 10     # Maximum hits per second for full pressure
-hit_timestamps = []
-
-def remap(num, inMin, inMax, inMid, outMin, outMax, outMid):
-    
-    # Calculate the input and output ranges
-    inRange = inMax - inMin
-    outRange = outMax - outMin
-    
-    # Calculate the input and output midpoints
-    inMidRange = inMid - inMin
-    outMidRange = outMid - outMin
-    
-    # Determine the input and output halves
-    if num <= inMid:
-        # Map the lower half
-        remapped_value = outMid - (inMid - num) / inMidRange * outMidRange
-    else:
-        # Map the upper half
-        remapped_value = outMid + (num - inMid) / (inRange - inMidRange) * (outRange - outMidRange)
-    
-    # Ensure the remapped value is within the output range
-    remapped_value = max(outMin, min(remapped_value, outMax))
-    
-    return remapped_value
-
-def update_hold_pressure(pressure, positive_input, negative_input, max_force, growth_rate, decay_rate):
-    if positive_input:
-        pressure = min(max_force, pressure + growth_rate)
-    elif negative_input:
-        pressure = max(-max_force, pressure - growth_rate)
-    else:
-        if pressure > 0:
-            pressure = max(0, pressure - decay_rate)
-        elif pressure < 0:
-            pressure = min(0, pressure + decay_rate)
-    return pressure
-
-def update_hold_pressure_multi(pressure, positive_input, negative_input, max_force, growth_rate, decay_rate, last_pressed_direction):
-    if positive_input and negative_input:
-        if last_pressed_direction == 'positive':
-            pressure = min(max_force, pressure + growth_rate)
-        elif last_pressed_direction == 'negative':
-            pressure = max(-max_force, pressure - growth_rate)
-    elif positive_input:
-        pressure = min(max_force, pressure + growth_rate)
-        last_pressed_direction = 'negative'
-    elif negative_input:
-        pressure = max(-max_force, pressure - growth_rate)
-        last_pressed_direction = 'positive'
-    else:
-        if pressure > 0:
-            pressure = max(0, pressure - decay_rate)
-        elif pressure < 0:
-            pressure = min(0, pressure + decay_rate)
-        last_pressed_direction = None #reset last pressed direction when nothing is pressed
-    return pressure, last_pressed_direction
-
-def update_hit_pressure(pressure, positive_input, negative_input, max_force, growth_rate, decay_rate, hit_timestamps, HIT_WINDOW, MAX_HITS):
-    now = time.time()
-    hit_timestamps[:] = [t for t in hit_timestamps if now - t <= HIT_WINDOW]
-
-    if positive_input:
-        hit_timestamps.append(now)
-        pressure = min(max_force, pressure + growth_rate)
-    elif negative_input:
-        # No timestamps added here for negative input.
-        pressure = max(-max_force, pressure - growth_rate)
-    else:
-        if pressure > 0:
-            pressure = max(0, pressure - decay_rate)
-        elif pressure < 0:
-            pressure = min(0, pressure + decay_rate)
-
-    hit_density = min(1.0, len(hit_timestamps) / MAX_HITS)
-    if pressure > 0:
-        pressure = min(pressure, hit_density * max_force)
-    elif pressure < 0:
-        # Negative pressure is not affected by hit density.
-        pass
-
-    return pressure
+    candidate.set_mode(RING2_PIN, module.OUTPUT)
+    candidate.set_mode(SLEEVE_PIN, module.OUTPUT)
+    candidate.write(RING2_PIN, 0)
+    candidate.write(SLEEVE_PIN,0)
+
+    output = PPMOutput(candidate, module, frame_us=PPM_FRAME.frame_us)
+    # pigpiod is ours alone, so wave_clear() any waves a crashed run left behind
+    output.start([module.pulse(*p) for p in ppm_encoder.encode(FAILSAFE_CHANNELS)], clear=True)
+    return output
+
+def connect_gpio():
+    # runs on its own thread: import pigpio, connect to pigpiod with backoff,
+    # then put a failsafe frame on air before any joystick is even seen
+    global pigpio, pi, ppm_output, gpio_state
+    module = get_GPIO() #pigpio if Linux & importable, else None
+    startup_mark("pigpio imported" if module else "no pigpio, debug mode")
+    if not module:
+        gpio_state = "debug"
+        return
+
+    delay = GPIO_RETRY_START_S
+    warned = False
+    while True:
+        #pi accesses the loacl Pi's GPIO pins. No banner per failed attempt,
+        #the deadline warning below says it once
+        candidate = module.pi(show_errors=False)
+        if candidate.connected:
+            try:
+                output = start_output(candidate, module)
+                break
+            except Exception: #pigpio.error, or pigpiod went away half way
+                logging.warning("PPM output setup failed, retrying", exc_info=True)
+                candidate.stop()
+        if not warned and time.perf_counter() - STARTUP_T0 > GPIO_DEADLINE_S:
+            logging.warning("pigpiod still not reachable %.0fs after start, no PPM output yet", GPIO_DEADLINE_S)
+            warned = True
+        time.sleep(delay)
+        delay = min(GPIO_RETRY_MAX_S, delay * 2)
+
+    pigpio, pi, ppm_output = module, candidate, output
+    gpio_state = "ready"
+    startup_mark("failsafe frame on air")
+
+
+# one control tick's worth of gimbal output. get_* methods advance pressure
+# state, so they are called exactly once per tick and everyone else (PPM
+# writer, display) reads this instead
+class GimbalSample:
+    __slots__ = ("timestamp", "throttle", "ail", "elev", "rudder", "aux", "channels")
+    def __init__(self, timestamp, throttle, ail, elev, rudder=0, aux=()):
+        self.timestamp = timestamp #time.monotonic() when sampled
+        self.throttle = throttle
+        self.ail = ail
+        self.elev = elev
+        self.rudder = rudder
+        self.aux = aux
+        self.channels = (throttle, ail, elev, rudder) + tuple(aux) #TAER channel order, then aux
 
 # define a simulated-gimbal abstract class (interface) and individual joystick classes
 # these will take joystick information in and output simulated gimbal results
@@ -128,6 +137,9 @@ def update_hit_pressure(pressure, positive_input, negative_input, max_force, gro
 class SimGimbal(ABC):
     def __init__(self, joystick: pygame.joystick.Joystick):
         self.joystick = joystick
+        self.last_sample = None
+        self.now_ns = None #sample time, for filters that track time themselves
+        self.dt = 1 / 30 #seconds since the previous sample, for the pressure filters
     @abstractmethod
     def get_throttle(self) -> float:
         return 0
@@ -137,113 +149,57 @@ class SimGimbal(ABC):
     @abstractmethod
     def get_elev(self) -> float:
         return 0
-
-#concrete subclasses of SimGimbal
-class DDRPad_Gimbal(SimGimbal): #working
-    def __init__(self, joystick: pygame.joystick.Joystick):
-        super().__init__(joystick)
-        self.config = get_config()["DDRPad_Gimbal"]
-
-        self.throttle = -1 # set throttle to "off"
-        self.ail_pressure = 0
-        self.ail_max_force = 1.0
-        self.ail_growth_rate = 0.1
-        self.ail_decay_rate = 0.25
-        self.elev_pressure = 0
-        self.elev_max_force = 1.0
-        self.elev_growth_rate = 0.05
-        self.elev_decay_rate = 0.1
-        self.ail_last_pressed = None
-        self.elev_last_pressed = None
-
-    def up_button(self):
-        return self.joystick.get_button(self.config["up"])
-    def down_button(self):
-        return self.joystick.get_button(self.config["down"])
-    def left_button(self):
-        return self.joystick.get_button(self.config["left"])
-    def right_button(self):
-        return self.joystick.get_button(self.config["right"])
-    def X_button(self):
-        return self.joystick.get_button(self.config["X"])
-    def O_button(self):
-        return self.joystick.get_button(self.config["O"])
-    def back_button(self):
-        return self.joystick.get_button(self.config["back"])
-    def select_button(self):
-        return self.joystick.get_button(self.config["select"])
-
-    def get_throttle(self) -> float:
-        if self.back_button():
-            self.throttle = -1 # set throttle to "off"
-        elif self.select_button():
-            self.throttle = -1 # set throttle to "off"
-        elif self.X_button():
-            self.throttle = 0 # set throttle to "50%"
-        elif self.O_button():
-            self.throttle = 1 # set throttle to "100%"
-        return (self.throttle)
-    def get_ail(self) -> float:
-        self.ail_pressure, self.ail_last_pressed = update_hold_pressure_multi(
-            self.ail_pressure, 
-            self.right_button(), 
-            self.left_button(), 
-            self.ail_max_force, 
-            self.ail_growth_rate, 
-            self.ail_decay_rate, 
-            self.ail_last_pressed
-            )
-        return (self.ail_pressure *.5)
-
-    def get_elev(self) -> float:
-        self.elev_pressure, self.elev_last_pressed = update_hold_pressure_multi(
-            self.elev_pressure, 
-            self.up_button(), 
-            self.down_button(), 
-            self.elev_max_force, 
-            self.elev_growth_rate, 
-            self.elev_decay_rate, 
-            self.elev_last_pressed
-            )
-        return (self.elev_pressure *.7)
-
+    # optional channels, centered unless a gimbal has something to drive them with
+    def get_rudder(self) -> float:
+        return 0
+    def get_aux(self) -> tuple:
+        return ()
+    def sample(self, now=None) -> GimbalSample:
+        # now is only passed in by replay, to run on recorded time
+        if now is None:
+            now = time.monotonic()
+        if self.last_sample is not None:
+            self.dt = min(MAX_DT, now - self.last_sample)
+        self.last_sample = now
+        self.now_ns = int(now * 1e9)
+        return GimbalSample(now, self.get_throttle(), self.get_ail(), self.get_elev(),
+                            self.get_rudder(), self.get_aux())
+
+#concrete subclasses of SimGimbal. The DDR pad and Xbox 360 controller are
+#profiles now, see profiles/
 class Drum_Gimbal(SimGimbal): #working
     def __init__(self, joystick: pygame.joystick.Joystick):
         super().__init__(joystick)
         self.config = get_config()["Drum_Gimbal"]
         self.elev_pressure = 0.0
         self.elev_max_force = 1.0  # -1.0 to 1.0
-        self.elev_growth_rate = 0.2
-        self.elev_decay_rate = 0.1
-        self.elev_hit_timestamps = []
-        self.elev_hit_window = 1.0 # seconds
-        self.elev_max_hits = 10 # hits per window
+        self.elev_growth_rate = 6.0 # per second
+        self.elev_decay_rate = 3.0
+        self.elev_hits = HitRateTracker(window=1.0, max_hits=10) # seconds, hits per window
         self.ail_pressure = 0.0
         self.ail_max_force = 1.0  # -1.0 to 1.0
-        self.ail_growth_rate = 0.2
-        self.ail_decay_rate = 0.1
-        self.ail_hit_timestamps = []
-        self.ail_hit_window = 1.0 # seconds
-        self.ail_max_hits = 5 # hits per window
+        self.ail_growth_rate = 6.0 # per second
+        self.ail_decay_rate = 3.0
+        self.ail_hits = HitRateTracker(window=1.0, max_hits=5) # seconds, hits per window
         self.armed = 0 #throttle arming
         self.throttle = -1 # set throttle to "off"
     
     def red_pad(self):
-        return self.joystick.get_button(2) #also circle
+        return self.joystick.get_button(self.config["red"]) #also circle
     def yellow_pad(self):
-        return self.joystick.get_button(3) #also triangle
+        return self.joystick.get_button(self.config["yellow"]) #also triangle
     def blue_pad(self):
-        return self.joystick.get_button(0) #also square
+        return self.joystick.get_button(self.config["blue"]) #also square
     def green_pad(self):
-        return self.joystick.get_button(1) #also X
+        return self.joystick.get_button(self.config["green"]) #also X
     def kick_pedal(self):
-        return self.joystick.get_button(4) #orange
+        return self.joystick.get_button(self.config["kick"]) #orange
     def select_button(self):
-        return self.joystick.get_button(8)
+        return self.joystick.get_button(self.config["select"])
     def home_button(self):
-        return self.joystick.get_button(12)
+        return self.joystick.get_button(self.config["home"])
     def start_button(self):
-        return self.joystick.get_button(9)
+        return self.joystick.get_button(self.config["start"])
     
     def get_throttle(self) -> float:
         if self.armed == 1:
@@ -272,9 +228,9 @@ class Drum_Gimbal(SimGimbal): #working
             self.ail_max_force,
             self.ail_growth_rate,
             self.ail_decay_rate,
-            self.ail_hit_timestamps,
-            self.ail_hit_window,
-            self.ail_max_hits
+            self.ail_hits,
+            self.dt,
+            self.now_ns
         )
         return (self.ail_pressure * 0.5)
     def get_elev(self) -> float:
@@ -285,9 +241,9 @@ class Drum_Gimbal(SimGimbal): #working
             self.elev_max_force,
             self.elev_growth_rate,
             self.elev_decay_rate,
-            self.elev_hit_timestamps,
-            self.elev_hit_window,
-            self.elev_max_hits
+            self.elev_hits,
+            self.dt,
+            self.now_ns
         )
         return (self.elev_pressure * 0.7)
 
@@ -299,6 +255,18 @@ class SteeringWheel_Gimbal(SimGimbal): #TODO
         self.armed = 0 #throttle arming
         self.throttle = -1 # set throttle to "off"
 
+        # calibration is fixed per device, compile it once
+        self.steering_cal = AxisCalibration(-0.898, 0.884, -0.031, -1, 1, 0)
+        if self.config["gas_brake"] is None: #linux doesn't have combined pedals
+            gas_mid = ((self.config["gas_max"]-self.config["gas_min"])/2)+self.config["gas_min"]
+            brake_mid = ((self.config["brake_max"]-self.config["brake_min"])/2)+self.config["brake_min"]
+            self.pedal_cals = (
+                (self.config["gas"], AxisCalibration(self.config["gas_min"], self.config["gas_max"], gas_mid, 0, 1, 0.5)),
+                (self.config["brake"], AxisCalibration(self.config["brake_min"], self.config["brake_max"], brake_mid, 0, 1, 0.5)),
+            )
+        else: #windows has combined gas and brake
+            self.gas_brake_cal = AxisCalibration(self.config["gas_brake_min"], self.config["gas_brake_max"], self.config["gas_brake_mid"], -1, 1, 0)
+
     def steering_wheel(self):
         return self.joystick.get_axis(self.config["steering"])
     def gas_brake_combo(self):
@@ -333,73 +301,48 @@ class SteeringWheel_Gimbal(SimGimbal): #TODO
 
         return (self.throttle)
     def get_ail(self) -> float:
-        calibrated_ail = remap((self.steering_wheel()), -0.898, 0.884, -0.031, -1, 1, 0)
+        calibrated_ail = self.steering_cal(self.steering_wheel())
         return ((calibrated_ail)*0.5) #steering wheel
     def get_elev(self) -> float:
         if self.config["gas_brake"] is None: #linux doesn't have combined pedals
-            gas_mid = ((self.config["gas_max"]-self.config["gas_min"])/2)+self.config["gas_min"]
-            brake_mid = ((self.config["brake_max"]-self.config["brake_min"])/2)+self.config["brake_min"]
-            calibrated_gas = remap(self.gas_pedal(), self.config["gas_min"], self.config["gas_max"], gas_mid , 0, 1, 0.5)
-            calibrated_brake = remap(self.brake_pedal(), self.config["brake_min"], self.config["brake_max"], brake_mid , 0, 1, 0.5)
-            print("gas: ",calibrated_gas)
-            print("brake: ",calibrated_brake)
+            calibrated_gas, calibrated_brake = calibrate_axes(self.pedal_cals, self.joystick.axes)
             return ((calibrated_gas - calibrated_brake)*0.6)
         
         else: #windows has combined gas and brake
-            #def remap(num, inMin, inMax, inMid, outMin, outMax, outMid):
-            calibrated_elev = remap((self.gas_brake_combo()), self.config["gas_brake_min"], self.config["gas_brake_max"], self.config["gas_brake_mid"], -1, 1, 0)
+            calibrated_elev = self.gas_brake_cal(self.gas_brake_combo())
             return ((calibrated_elev)*0.6) #gas and brake pedal
 
 
-#Right Gimbal for drive, Left Trigger for Weapon
-class Xbox360_Gimbal(SimGimbal): #working
-    def __init__(self, joystick: pygame.joystick.Joystick):
-        super().__init__(joystick)
-        self.config = get_config()["Xbox360_Gimbal"]
-
-    def left_trigger(self):
-        return self.joystick.get_axis(self.config["left_trigger"])
-    def right_gimbal_LR(self):
-        return self.joystick.get_axis(self.config["right_gimbal_LR"])
-    def right_gimbal_UD(self):
-        return (self.joystick.get_axis(self.config["right_gimbal_UD"])*-1)
-
-    def get_throttle(self) -> float:
-        return (self.left_trigger()) #L trigger
-    def get_ail(self) -> float:
-        return (self.right_gimbal_LR()) #R gimbal L/R
-    def get_elev(self) -> float:
-        return (self.right_gimbal_UD()) #R gimbal U/D
-
 #Strum for Forwards/Backwards, 
 class Guitar_Gimbal(SimGimbal): #working
     def __init__(self, joystick: pygame.joystick.Joystick):
         super().__init__(joystick)
         self.pressure = 0
-        self.growth_rates = [0.1, 0.07, 0.05]  # Adjust speeds for smooth transitions
+        self.growth_rates = [3.0, 2.1, 1.5]  # Adjust speeds for smooth transitions (per second)
         self.max_forces = [0.1, 0.2, 0.4]  # Max pressures for each tier
-        self.decay_rate = 0.03  # Rate of returning to 0
+        self.decay_rate = 0.9  # Rate of returning to 0 (per second)
         self.last_direction = 0  # -1 for left, 1 for right, 0 for neutral
         self.elev_pressure = 0
         self.elev_max_force = 0.75
-        self.elev_growth_rate = 0.05
-        self.elev_decay_rate = 0.05
+        self.elev_growth_rate = 1.5 # per second
+        self.elev_decay_rate = 1.5
         self.throttle = -1 # set throttle to "off"
+        self.config = get_config()["Guitar_Gimbal"]
 
     def green_button(self):
-        return self.joystick.get_button(1)
+        return self.joystick.get_button(self.config["green"])
     def red_button(self):
-        return self.joystick.get_button(0)
+        return self.joystick.get_button(self.config["red"])
     def yellow_button(self):
-        return self.joystick.get_button(3)
+        return self.joystick.get_button(self.config["yellow"])
     def blue_button(self):
-        return self.joystick.get_button(2)
+        return self.joystick.get_button(self.config["blue"])
     def orange_button(self):
-        return self.joystick.get_button(6)
+        return self.joystick.get_button(self.config["orange"])
     def plus_button(self):
-        return self.joystick.get_button(9)
+        return self.joystick.get_button(self.config["plus"])
     def minus_button(self):
-        return self.joystick.get_button(8)
+        return self.joystick.get_button(self.config["minus"])
 
     def get_throttle(self) -> float:
         if self.orange_button():
@@ -452,6 +395,7 @@ class Guitar_Gimbal(SimGimbal): #working
         else:
             target_pressure = 0
             growth_rate = self.decay_rate
+        growth_rate *= self.dt
 
         # Smoothly adjust pressure
         if self.pressure < target_pressure:
@@ -463,11 +407,12 @@ class Guitar_Gimbal(SimGimbal): #working
     def get_elev(self) -> float:
         self.elev_pressure = update_hold_pressure(
             self.elev_pressure, 
-            (-1 == self.joystick.get_hat(0)[1]), 
-            (1 == self.joystick.get_hat(0)[1]), 
+            (-1 == self.joystick.get_hat(self.config["strum"])[1]), 
+            (1 == self.joystick.get_hat(self.config["strum"])[1]), 
             self.elev_max_force, 
             self.elev_growth_rate, 
-            self.elev_decay_rate
+            self.elev_decay_rate,
+            self.dt
             )
         return self.elev_pressure
         #return (self.joystick.get_hat(0)[1]*-1) #strum down = forward, up=backwards
@@ -480,126 +425,591 @@ class KeyboardMouse_Gimbal(SimGimbal): #TODO
     def get_elev(self) -> float:
         return (self.joystick.get_button(0) + 0.1)
 
-def gimbal_factory(joystick: pygame.joystick.Joystick) -> SimGimbal:
-    joystick_name = joystick.get_name().lower()
-    #print("Factory Name: ", joystick_name)
-    if "gamepad" in joystick_name: #USB Gamepad
-        return DDRPad_Gimbal(joystick)
-    elif "drum" in joystick_name: #Licensed by Sony Computer Entertainment America Harmonix Drum Kit for PlayStation(R)3
-        return Drum_Gimbal(joystick)
-    elif "windows" in joystick_name: #MY-POWER CO.,LTD Controller For Windows
-        return Guitar_Gimbal(joystick)
-    elif "driving" in joystick_name:
-        return SteeringWheel_Gimbal(joystick)
-    elif "xbox" in joystick_name:
-        return Xbox360_Gimbal(joystick) #Xbox 360 Controller
-    else:
-        return KeyboardMouse_Gimbal(joystick)
-
-pygame.init()
-pygame.joystick.init()
-screen = pygame.display.set_mode((500, 700),pygame.RESIZABLE)
-clock = pygame.time.Clock()
-font = pygame.font.Font(None, 24)
-joysticks = {}
-gimbals = {}
-running = True
+# Gimbal driven by a compiled device profile (profiles.py). sample() walks the
+# profile's flat channel table instead of going through get_* methods.
+class ProfileGimbal(SimGimbal):
+    def __init__(self, joystick: pygame.joystick.Joystick, profile):
+        super().__init__(joystick)
+        self.profile = profile
+        self.table = profile.build(joystick, clock_ns=lambda: self.now_ns)
+
+    def get_throttle(self) -> float:
+        return self.table[0](self.dt)
+    def get_ail(self) -> float:
+        return self.table[1](self.dt)
+    def get_elev(self) -> float:
+        return self.table[2](self.dt)
+    def get_rudder(self) -> float:
+        return self.table[3](self.dt)
+    def get_aux(self) -> tuple:
+        return tuple(fn(self.dt) for fn in self.table[4:])
+
+    def sample(self, now=None) -> GimbalSample:
+        if now is None:
+            now = time.monotonic()
+        if self.last_sample is not None:
+            self.dt = min(MAX_DT, now - self.last_sample)
+        self.last_sample = now
+        self.now_ns = int(now * 1e9)
+        dt = self.dt
+        values = [fn(dt) for fn in self.table]
+        return GimbalSample(now, values[0], values[1], values[2], values[3], tuple(values[4:]))
+
+gimbal_registry = None #built on first use, see registry.py
+
+def build_registry():
+    registry = GimbalRegistry(default=KeyboardMouse_Gimbal)
+    # data-only profiles first, then plugins, then the hand written classes
+    for profile in load_profiles():
+        factory = lambda joystick, profile=profile: ProfileGimbal(joystick, profile)
+        matcher = (lambda name, r=profile.name_re: r.search(name) is not None) if profile.name_re else None
+        registry.register(factory, guids=profile.guids, matcher=matcher)
+    registry.load_plugins()
+    registry.register(Drum_Gimbal, names=["drum"]) #Licensed by Sony Computer Entertainment America Harmonix Drum Kit for PlayStation(R)3
+    registry.register(Guitar_Gimbal, names=["windows"]) #MY-POWER CO.,LTD Controller For Windows
+    registry.register(SteeringWheel_Gimbal, names=["driving"])
+    return registry
 
-while running:
-    screen.fill((255, 255, 255))
+def gimbal_factory(joystick: pygame.joystick.Joystick) -> SimGimbal:
+    global gimbal_registry
+    if gimbal_registry is None:
+        gimbal_registry = build_registry()
+    return gimbal_registry.create(joystick)
+
+HIDDEN_JOYSTICKS = ("3Dconnexion KMJ Emulator", "SpaceNavigator") #Hide 3D mouse outputs
+CONTROL_RATE_HZ = 100 #gimbal sampling + PPM update rate, 50-250 is sensible
+UI_RATE_HZ = 30 #diagnostics redraw rate, independent of the control loop
+# with several joysticks attached their outputs are merged into one PPM frame
+# per tick, see mixer.py. --mix overrides the mode.
+mixer = ChannelMixer(mode="priority", priorities=("xbox", "driving", "gamepad", "drum", "windows"))
+
+def write_frame(channel_us):
+    # -> True once the frame is on its way out
+    if gpio_state == "ready":
+        t0 = time.perf_counter_ns()
+        pulses = [pigpio.pulse(*p) for p in ppm_encoder.encode_us(channel_us)]
+        t1 = time.perf_counter_ns()
+        metrics.record("encode", t1 - t0)
+        if not ppm_output.update(pulses):
+            metrics.count("upload_deferred")
+            return False #previous frame still going out, retry next tick
+        metrics.record("upload", time.perf_counter_ns() - t1)
+        return True
+    if gpio_state == "connecting":
+        return False #failsafe goes out first, then the latest channels once connected
+    return True #debug mode, nowhere to send it; --telemetry shows what would have gone out
+
+def engage_failsafe():
+    # watchdog thread: switch to the pre-uploaded failsafe wave
+    if gpio_state == "ready":
+        try:
+            ppm_output.engage_failsafe()
+        except pigpio.error as e: #pigpiod restarted, the failsafe wave id is gone
+            logging.warning("couldn't engage the failsafe wave: %s", e)
+
+def release_failsafe():
+    ppm_filter.reset() #what we last sent isn't on air any more, resend it
+    if gpio_state == "ready":
+        ppm_output.release_failsafe()
+
+def send_ppm(channels):
+    channel_us = PPM_FRAME.channel_us(channels)
+    t_ns = time.monotonic_ns()
+    now = t_ns / 1e9
+    #if the pulse widths haven't (meaningfully) changed, don't resend.
+    #Nothing goes out while the watchdog holds the failsafe frame
+    sent = (not (watchdog and watchdog.tripped)
+            and ppm_filter.wants(channel_us, now) and write_frame(channel_us))
+    if sent:
+        ppm_filter.mark_sent(channel_us, now)
+        # how stale the newest input is by the time its frame reaches pigpio
+        if last_input_ns:
+            metrics.record("input_to_ppm", time.monotonic_ns() - last_input_ns)
+    if telemetry:
+        telemetry.write(t_ns, MIXED, channel_us, sent)
+
+# The control loop runs in its own thread so a slow font.render/display.flip
+# never delays a PPM frame. The UI thread only swaps in a new tuple of active
+# gimbals and reads back the latest channel snapshot; both are replaced whole
+# (never mutated) so neither side needs a lock.
+active_gimbals = () #(jid, name, gimbal), rebuilt by the UI thread on hotplug
+snapshot = {} #jid -> GimbalSample from the latest control tick
+mixed_channels = None #what went to send_ppm on the latest tick
+last_input_ns = 0 #monotonic_ns of the latest joystick input event
+metrics = Metrics() #hot path latency histograms, see metrics.py
+
+def sample_and_mix():
+    # one control tick's input side: every gimbal sampled once, then merged.
+    # -> ({jid: GimbalSample}, mixed channels or None)
+    t0 = time.perf_counter_ns()
+    samples = {}
+    sources = []
+    for jid, name, gimbal in active_gimbals:
+        sample = gimbal.sample()
+        samples[jid] = sample
+        sources.append((name, sample.channels))
+    t1 = time.perf_counter_ns()
+    channels = mixer.mix(sources)
+    metrics.record("gimbal", t1 - t0)
+    metrics.record("mix", time.perf_counter_ns() - t1)
+    if telemetry:
+        # each device's own channels, next to the MIXED frame send_ppm logs
+        t_ns = time.monotonic_ns()
+        for jid, sample in samples.items():
+            telemetry.write(t_ns, jid, PPM_FRAME.channel_us(sample.channels), False)
+    return samples, channels
+
+def control_loop(realtime=False, cpu=None, priority=None):
+    # realtime: strict absolute-deadline cadence with no early wake on input,
+    # optionally pinned to cpu and at SCHED_FIFO priority, GC only between ticks
+    global snapshot, mixed_channels
+    if realtime:
+        setup_realtime_thread(cpu, priority)
+    scheduler = DeadlineScheduler(CONTROL_RATE_HZ, metrics, wake=None if realtime else input_changed,
+                                  realtime=realtime)
+    scheduler.start()
+    last_start = None
+    while running:
+        t0 = time.perf_counter_ns()
+        if last_start is not None:
+            metrics.record("tick_period", t0 - last_start)
+        last_start = t0
+        samples, channels = sample_and_mix()
+        t2 = time.perf_counter_ns()
+        if channels is not None:
+            send_ppm(channels) #one wave update per tick, however many devices
+            if watchdog:
+                watchdog.feed("control")
+        snapshot = samples
+        mixed_channels = channels
+        t3 = time.perf_counter_ns()
+        metrics.record("output", t3 - t2)
+        metrics.record("tick", t3 - t0)
+        scheduler.wait() #until the next deadline, or sooner if input changed
+    scheduler.stop()
+
+def update_active_gimbals():
+    global active_gimbals
+    active_gimbals = tuple(
+        (jid, joystick.get_name(), gimbals[jid]) for jid, joystick in joysticks.items()
+        if joystick.get_name() not in HIDDEN_JOYSTICKS and jid in gimbals
+    )
+
+def add_joystick(joystick):
+    # joystick: pygame.joystick.Joystick or anything with its surface (evdev)
+    state = JoystickState(joystick)
+    joysticks[joystick.get_instance_id()] = state
+    try:
+        gimbals[joystick.get_instance_id()] = gimbal_factory(state)
+    except ProfileError as e:
+        # the profile asks for an axis/button this device lacks. The device
+        # stays listed but drives nothing, update_active_gimbals skips it
+        logging.warning("no gimbal for %s: %s", joystick.get_name(), e)
+    update_active_gimbals()
+    if recorder:
+        recorder.add(state)
+    return state
+
+def remove_joystick(jid):
+    if jid in joysticks:
+        del joysticks[jid]
+    if jid in gimbals:
+        del gimbals[jid]
+    update_active_gimbals()
+    if recorder:
+        recorder.remove(jid)
+
+def add_evdev_joystick(joystick):
+    joystick.attach(add_joystick(joystick))
+    joystick.recorder = recorder #evdev input bypasses handle_input_event
+
+def poll_evdev(backend, timeout):
+    # apply whatever evdev input arrives within timeout seconds (also
+    # rescans for hotplug when due)
+    global last_input_ns
+    t0 = time.perf_counter_ns()
+    ready = backend.poll(timeout)
+    if ready:
+        metrics.record("input", time.perf_counter_ns() - t0)
+        # kernel timestamps are monotonic (EVIOCSCLOCKID), so input_to_ppm
+        # includes the time the event sat in the kernel buffer
+        last_input_ns = max(joystick.last_event_ns for joystick in ready) or time.monotonic_ns()
+
+def run_evdev():
+    # headless input loop without pygame: epoll over /dev/input/event*
+    backend = EvdevBackend(add_evdev_joystick, remove_joystick)
+    startup_mark("evdev ready")
+    try:
+        while running:
+            if watchdog:
+                watchdog.feed("input")
+            poll_evdev(backend, 0.1)
+    finally:
+        backend.close()
+
+# --runtime asyncio (headless only): the same work as control_loop and the
+# input loop, split into tasks on one event loop and joined by latest-value
+# topics (see runtime.py). There's no diagnostics task, a blocking redraw on
+# the loop would stall the control task. The gpio connect, watchdog and status
+# threads stay threads; the watchdog in particular has to keep running if the
+# loop itself stalls.
+SDL_POLL_S = 0.002 #SDL has no fd to wait on, its queue is polled this often
+
+async def input_task(input_wake, backend=None):
+    # keeps the JoystickStates current from SDL, or from evdev (backend) by
+    # waiting on its epoll fd, and wakes the control task when input changed
+    loop = asyncio.get_running_loop()
+    readable = asyncio.Event()
+    if backend:
+        loop.add_reader(backend.selector.fileno(), readable.set)
+    try:
+        while running:
+            if watchdog:
+                watchdog.feed("input")
+            if backend:
+                poll_evdev(backend, 0)
+            else:
+                for event in pygame.event.get():
+                    handle_event(event)
+            if input_changed.is_set():
+                input_changed.clear()
+                input_wake.set()
+            if backend:
+                try:
+                    await asyncio.wait_for(readable.wait(), backend.rescan_s / 10)
+                except asyncio.TimeoutError:
+                    pass
+                readable.clear()
+            else:
+                await asyncio.sleep(SDL_POLL_S)
+    finally:
+        if backend:
+            loop.remove_reader(backend.selector.fileno())
+            backend.close()
+
+async def control_task(input_wake, frames, sample_topic):
+    # fixed-rate ticks on the DeadlineScheduler grid, an early extra tick on input
+    global snapshot, mixed_channels
+    scheduler = DeadlineScheduler(CONTROL_RATE_HZ, metrics)
+    scheduler.start()
+    last_start = None
+    while running:
+        t0 = time.perf_counter_ns()
+        if last_start is not None:
+            metrics.record("tick_period", t0 - last_start)
+        last_start = t0
+        samples, channels = sample_and_mix()
+        if channels is not None:
+            frames.publish(channels)
+        sample_topic.publish(samples)
+        snapshot = samples
+        mixed_channels = channels
+        metrics.record("tick", time.perf_counter_ns() - t0)
+
+        remaining_ns = scheduler.remaining()
+        if remaining_ns is None: #overran, go again straight away
+            input_wake.clear()
+            await asyncio.sleep(0) #still let output and input run
+            continue
+        try:
+            await asyncio.wait_for(input_wake.wait(), remaining_ns / 1e9)
+        except asyncio.TimeoutError:
+            scheduler.reached()
+        input_wake.clear()
+    scheduler.stop()
+
+async def output_task(frames):
+    # newest mixed frame -> PPM. A frame that arrives while one is being sent
+    # replaces any older one still waiting. The upload is several blocking
+    # round trips to pigpiod, so it runs on its own thread: a slow pigpiod
+    # only holds up this task, never the control or input tasks.
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="output")
+    try:
+        while running:
+            channels = await frames.get()
+            t0 = time.perf_counter_ns()
+            await loop.run_in_executor(executor, send_ppm, channels)
+            metrics.record("output", time.perf_counter_ns() - t0)
+            if watchdog:
+                watchdog.feed("control")
+    finally:
+        executor.shutdown(wait=False) #shutdown() engages the failsafe under PPMOutput's lock anyway
+
+async def run_async(backend=None, sinks=()):
+    # sinks: extra consumers, each an async fn(frames, samples) given its own
+    # subscriptions, e.g. a network forwarder. Nothing else needs changing.
+    input_wake = asyncio.Event()
+    frames = Topic("frames")
+    sample_topic = Topic("samples")
+    tasks = [
+        input_task(input_wake, backend),
+        control_task(input_wake, frames, sample_topic),
+        output_task(frames.subscribe()),
+    ]
+    tasks += [sink(frames.subscribe(), sample_topic.subscribe()) for sink in sinks]
+    await run_tasks(tasks)
+
+def handle_event(event):
+    global running, last_input_ns
+    if event.type == pygame.QUIT:
+        running = False
+
+    elif event.type in (pygame.VIDEORESIZE, pygame.VIDEOEXPOSE):
+        if panel:
+            panel.invalidate()
+
+    elif event.type == pygame.JOYDEVICEADDED:
+        add_joystick(pygame.joystick.Joystick(event.device_index))
+
+    elif event.type == pygame.JOYDEVICEREMOVED:
+        remove_joystick(event.instance_id)
+
+    #keep the input cache current, gimbals never call into SDL themselves
+    elif event.type in INPUT_EVENTS:
+        t0 = time.perf_counter_ns()
+        handle_input_event(event)
+        last_input_ns = time.monotonic_ns()
+        metrics.record("input", time.perf_counter_ns() - t0)
+
+def handle_input_event(event):
+    if event.type == pygame.JOYAXISMOTION:
+        if event.instance_id in joysticks:
+            joysticks[event.instance_id].set_axis(event.axis, event.value)
+            if recorder:
+                recorder.axis(event.instance_id, event.axis, event.value)
+    elif event.type == pygame.JOYBUTTONDOWN:
+        if event.instance_id in joysticks:
+            joysticks[event.instance_id].set_button(event.button, 1)
+            if recorder:
+                recorder.button(event.instance_id, event.button, 1)
+    elif event.type == pygame.JOYBUTTONUP:
+        if event.instance_id in joysticks:
+            joysticks[event.instance_id].set_button(event.button, 0)
+            if recorder:
+                recorder.button(event.instance_id, event.button, 0)
+    elif event.type == pygame.JOYHATMOTION:
+        if event.instance_id in joysticks:
+            joysticks[event.instance_id].set_hat(event.hat, event.value)
+            if recorder:
+                recorder.hat(event.instance_id, event.hat, event.value)
+
+def draw_diagnostics():
+    lines = []
     y_offset = 10
-    
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-        
-        if event.type == pygame.JOYDEVICEADDED:
-            joystick = pygame.joystick.Joystick(event.device_index)
-            joysticks[joystick.get_instance_id()] = joystick
-            gimbals[joystick.get_instance_id()] = gimbal_factory(joystick)
-        
-        if event.type == pygame.JOYDEVICEREMOVED:
-            if event.instance_id in joysticks:
-                del joysticks[event.instance_id]
-            if event.instance_id in gimbals:
-                del gimbals[event.instance_id]
-    
+
+    samples = snapshot
     for jid, joystick in joysticks.items():
-        gimbal = gimbals[jid]
         jname = joystick.get_name()
-        text_title = font.render(f"Joystick {jid}: {jname}", True, (0, 0, 0))
-        screen.blit(text_title, (10, y_offset))
+        lines.append((f"Joystick {jid}: {jname}", (10, y_offset)))
         y_offset += 20
-        if (jname == "3Dconnexion KMJ Emulator") or (jname == "SpaceNavigator"): #Hide 3D mouse outputs
+        if jname in HIDDEN_JOYSTICKS:
             pass
         else:
-            # Display Gimbal values
-            CHANNELS = ( #TAER channel order, no R
-                gimbal.get_throttle(),
-                gimbal.get_ail(),
-                gimbal.get_elev(),
-            )
-
-            #tuple for immutability
-            _output = CHANNELS
-
-            #if input hasn't changed, don't resend
-            if _output == prev:
-                pass
-
-            elif pigpio:
-                pulses, pos = [], 0
-                for value in _output:
-                    us = int(round(1500 + 500 * value)) #1000-2000us pulse with 1500 being center times +/-1 for value range
-                    pulses += [pigpio.pulse(0, pi_gpio, 300),
-                        pigpio.pulse(pi_gpio, 0, us -300)]
-                    pos += us
-                
-                pulses += [pigpio.pulse(0, pi_gpio, 300),
-                       pigpio.pulse(pi_gpio, 0, 20000 - 300 - pos - 1)]
-
-                pi.wave_add_generic(pulses)
-                waves.append(pi.wave_create())
-                pi.wave_send_using_mode(waves[-1], pigpio.WAVE_MODE_REPEAT_SYNC)
-
-                last, waves = waves[0], waves[1:]
-                if last:
-                    pi.wave_delete(last)
-            
-            else: #debug mode
-                print("debug")
-                print(str(_output))
-            
-            prev = _output
-
-            text_surface = font.render(f"Gimbals -> Throttle: {gimbal.get_throttle():.3f}, Ail: {gimbal.get_ail():.3f}, Elev: {gimbal.get_elev():.3f}", True, (0, 0, 0))
-            screen.blit(text_surface, (10, y_offset))
+            # Display Gimbal values from the control thread's last tick
+            if jid in samples:
+                sample = samples[jid]
+                lines.append((f"Gimbals -> Throttle: {sample.throttle:.3f}, Ail: {sample.ail:.3f}, Elev: {sample.elev:.3f}", (10, y_offset)))
             y_offset += 20
             # Display raw axis values
             axes = joystick.get_numaxes()
             for i in range(axes):
                 axis_value = joystick.get_axis(i)
-                axis_surface = font.render(f"Axis {i}: {axis_value:.3f}", True, (0, 0, 0))
-                screen.blit(axis_surface, (10, y_offset))
+                lines.append((f"Axis {i}: {axis_value:.3f}", (10, y_offset)))
                 y_offset += 20
             
             # Display button states
             buttons = joystick.get_numbuttons()
             for i in range(buttons):
                 button_value = joystick.get_button(i)
-                button_surface = font.render(f"Button {i}: {button_value}", True, (0, 0, 0))
-                screen.blit(button_surface, (10, y_offset))
+                lines.append((f"Button {i}: {button_value}", (10, y_offset)))
                 y_offset += 20
             
             # Display hat switch states
             hats = joystick.get_numhats()
             for i in range(hats):
                 hat_value = joystick.get_hat(i)
-                hat_surface = font.render(f"Hat {i}: {hat_value}", True, (0, 0, 0))
-                screen.blit(hat_surface, (10, y_offset))
+                lines.append((f"Hat {i}: {hat_value}", (10, y_offset)))
                 y_offset += 30
     
-    pygame.display.flip()
-    clock.tick(30)
-
-pygame.quit()
+    panel.draw(lines)
+
+def get_status():
+    # what the status socket reports, built from the published snapshot only
+    samples = snapshot
+    devices = joysticks.copy() #the UI thread adds/removes devices under us
+    now = time.monotonic()
+    return {
+        "control_rate_hz": CONTROL_RATE_HZ,
+        "deadlines_missed": metrics.counters.get("deadline_missed", 0),
+        "gpio": gpio_state,
+        "failsafe": {"engaged": watchdog.tripped, "trips": watchdog.trips} if watchdog else None,
+        "mix_mode": mixer.mode,
+        "output": list(mixed_channels) if mixed_channels is not None else None,
+        "updates": ppm_filter.counters(),
+        "waves": ppm_output.usage() if gpio_state == "ready" else None,
+        "latency": metrics.summary(),
+        "joysticks": {
+            str(jid): {
+                "name": devices[jid].get_name() if jid in devices else None,
+                "channels": list(sample.channels),
+                "age_ms": round((now - sample.timestamp) * 1000, 1),
+            }
+            for jid, sample in samples.items()
+        },
+    }
+
+joysticks = {} #jid -> JoystickState
+gimbals = {}
+running = True
+screen = None
+font = None
+panel = None
+recorder = None #InputRecorder when running with --record
+INPUT_EVENTS = () #joystick input event types, filled in once pygame is imported
+telemetry = None #TelemetryWriter when running with --telemetry
+watchdog = None #FailsafeWatchdog, off with --failsafe-timeout 0
+
+def shutdown():
+    if watchdog:
+        watchdog.stop()
+    engage_failsafe() #pigpiod keeps repeating the last wave after we exit
+    if recorder:
+        recorder.close()
+    if telemetry:
+        telemetry.close()
+    if pygame:
+        pygame.quit()
+
+def main():
+    global pygame, screen, font, panel, running, mixer, recorder, telemetry, INPUT_EVENTS, watchdog
+    startup_mark("start")
+    parser = argparse.ArgumentParser(description="USB joystick to PPM over GPIO")
+    parser.add_argument("--headless", action="store_true",
+                        help="no window or rendering, for Pis without a monitor")
+    parser.add_argument("--status-port", type=int, default=None,
+                        help="serve a one-line JSON status on this localhost TCP port")
+    parser.add_argument("--mix", choices=MIX_MODES, default=None,
+                        help="how to merge several joysticks into one PPM frame")
+    parser.add_argument("--record", metavar="PATH", default=None,
+                        help="record joystick input to PATH for replay with recording.py")
+    parser.add_argument("--telemetry", metavar="PATH", default=None,
+                        help="log every PPM frame decision to a ring file, read it with telemetry.py")
+    parser.add_argument("--failsafe-timeout", type=float, default=FAILSAFE_TIMEOUT_S, metavar="SECONDS",
+                        help="send the failsafe frame when output stalls this long, 0 disables")
+    parser.add_argument("--input", choices=("sdl", "evdev"), default="sdl",
+                        help="evdev reads /dev/input directly without loading pygame (Linux, --headless only)")
+    parser.add_argument("--runtime", choices=("threads", "asyncio"), default="threads",
+                        help="control and UI on their own threads, or (headless) everything as asyncio tasks")
+    parser.add_argument("--rt", action="store_true",
+                        help="real-time control loop: absolute deadlines, no GC during ticks")
+    parser.add_argument("--rt-cpu", type=int, default=None,
+                        help="with --rt, pin the control thread to this core")
+    parser.add_argument("--rt-priority", type=int, default=None,
+                        help="with --rt, SCHED_FIFO priority 1-99 for the control thread (needs root)")
+    args = parser.parse_args()
+    if args.input == "evdev" and not args.headless:
+        parser.error("--input evdev needs --headless, the diagnostics window is drawn with pygame")
+    if args.runtime == "asyncio" and not args.headless:
+        parser.error("--runtime asyncio needs --headless, redrawing the window would stall the control task")
+    if args.rt and args.runtime != "threads":
+        parser.error("--rt schedules the control thread, it needs --runtime threads")
+    if args.telemetry:
+        telemetry = TelemetryWriter(args.telemetry)
+    if args.record:
+        recorder = InputRecorder(args.record)
+    if args.mix:
+        mixer = ChannelMixer(mode=args.mix, priorities=mixer.priorities,
+                             channel_sources=mixer.channel_sources)
+
+    # PPM output comes up in parallel with SDL, failsafe first
+    threading.Thread(target=connect_gpio, name="gpio", daemon=True).start()
+
+    if args.input == "sdl":
+        if args.headless:
+            # SDL still needs a video driver for its event queue, the dummy one
+            # never opens a window. Only bring up display + joystick, not mixer etc.
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
+        import pygame as _pygame
+        pygame = _pygame
+        INPUT_EVENTS = (pygame.JOYAXISMOTION, pygame.JOYBUTTONDOWN, pygame.JOYBUTTONUP, pygame.JOYHATMOTION)
+        startup_mark("pygame imported")
+        if args.headless:
+            pygame.display.init()
+            pygame.joystick.init()
+        else:
+            from diagnostics import DiagnosticsPanel
+            pygame.init()
+            pygame.joystick.init()
+            screen = pygame.display.set_mode((500, 700),pygame.RESIZABLE)
+            font = pygame.font.Font(None, 24)
+            panel = DiagnosticsPanel(screen, font)
+        startup_mark("pygame ready")
+
+    if args.status_port:
+        serve_status(args.status_port, get_status)
+
+    install_dump_signal(metrics) #kill -USR1 <pid> prints the latency report
+    if args.failsafe_timeout > 0:
+        watchdog = FailsafeWatchdog(args.failsafe_timeout, engage_failsafe, release_failsafe,
+                                    names=("control", "input"), metrics=metrics)
+        watchdog.start()
+
+    # from here on any exit - Ctrl-C, a crash in a loop, a bad device -
+    # must still leave the failsafe frame on air
+    control_thread = None
+    try:
+        if args.runtime == "asyncio":
+            backend = EvdevBackend(add_evdev_joystick, remove_joystick) if args.input == "evdev" else None
+            startup_mark("asyncio runtime starting")
+            try:
+                asyncio.run(run_async(backend))
+            except KeyboardInterrupt:
+                pass
+            return
+
+        control_thread = threading.Thread(target=control_loop, name="control", daemon=True,
+                                          args=(args.rt, args.rt_cpu, args.rt_priority))
+        control_thread.start()
+        startup_mark("control loop running")
+
+        next_draw = time.monotonic()
+        try:
+            if args.input == "evdev":
+                run_evdev()
+            while running:
+                if watchdog:
+                    watchdog.feed("input")
+                if args.headless:
+                    # nothing to draw, just keep the input cache fed
+                    handle_event(pygame.event.wait(100))
+                    for event in pygame.event.get():
+                        handle_event(event)
+                    continue
+
+                # block on the event queue until the next redraw is due, so input events
+                # reach the cache (and wake the control thread) as soon as SDL sees them
+                timeout_ms = max(1, int((next_draw - time.monotonic()) * 1000))
+                handle_event(pygame.event.wait(timeout_ms))
+                for event in pygame.event.get():
+                    handle_event(event)
+
+                if time.monotonic() < next_draw:
+                    continue
+                next_draw += 1.0 / UI_RATE_HZ
+                if next_draw < time.monotonic(): #slow frame, skip ahead
+                    next_draw = time.monotonic() + 1.0 / UI_RATE_HZ
+
+                t0 = time.perf_counter_ns()
+                draw_diagnostics()
+                metrics.record("render", time.perf_counter_ns() - t0)
+        except KeyboardInterrupt: #Ctrl-C is the only way out when headless
+            pass
+    finally:
+        running = False
+        if control_thread:
+            control_thread.join(1.0) #a wedged control thread mustn't block the failsafe
+        shutdown()
+
+if __name__ == "__main__":
+    main()
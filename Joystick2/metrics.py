@@ -0,0 +1,129 @@
+# metrics.py
+# Latency histograms for the hot path. Buckets are HDR style: values are
+# grouped by power of two, each power split into 16 linear sub-buckets, so
+# every recorded value is kept to within ~6% from nanoseconds up to minutes.
+# Recording is a bit_length and a list increment - cheap enough to leave on.
+#
+# Dump on demand with `kill -USR1 <pid>` (see install_dump_signal) or from
+# the status socket's "latency" entry.
+import sys
+import signal
+import threading
+
+SUB_BUCKETS = 16
+SUB_BITS = 4 #log2(SUB_BUCKETS)
+BUCKETS = 64 * SUB_BUCKETS
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    @staticmethod
+    def _index(value):
+        if value < 2 * SUB_BUCKETS:
+            return value
+        shift = value.bit_length() - SUB_BITS - 1
+        return (shift + 1) * SUB_BUCKETS + (value >> shift) - SUB_BUCKETS
+
+    @staticmethod
+    def _value(index):
+        # upper edge of a bucket, so percentiles never under-report
+        if index < 2 * SUB_BUCKETS:
+            return index
+        shift = index // SUB_BUCKETS - 1
+        return ((index % SUB_BUCKETS + SUB_BUCKETS + 1) << shift) - 1
+
+    def record(self, value):
+        value = int(value)
+        if value < 0:
+            value = 0
+        self.counts[self._index(value)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, p):
+        if not self.count:
+            return 0
+        target = max(1, int(round(self.count * p / 100)))
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                return min(self._value(index), self.max)
+        return self.max
+
+    def summary(self, scale=1000):
+        # default scale reports ns values in us
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "min": self.min / scale,
+            "mean": self.total / self.count / scale,
+            "p50": self.percentile(50) / scale,
+            "p90": self.percentile(90) / scale,
+            "p99": self.percentile(99) / scale,
+            "p99.9": self.percentile(99.9) / scale,
+            "max": self.max / scale,
+        }
+
+class Metrics:
+    # named histograms (ns) plus plain counters, created on first use
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+        # taken to create a new name and to copy the tables for a report.
+        # Reentrant because the SIGUSR1 report can land on a thread holding it.
+        self.lock = threading.RLock()
+
+    def record(self, name, value_ns):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(name, LatencyHistogram())
+        histogram.record(value_ns)
+
+    def count(self, name, n=1):
+        if name not in self.counters:
+            with self.lock:
+                self.counters.setdefault(name, 0)
+        self.counters[name] += n
+
+    def _tables(self):
+        # sorted copies, safe to walk while other threads add names
+        with self.lock:
+            return sorted(self.histograms.items()), sorted(self.counters.items())
+
+    def summary(self):
+        histograms, counters = self._tables()
+        out = {name: h.summary() for name, h in histograms}
+        out["counters"] = dict(counters)
+        return out
+
+    def report(self, out=sys.stderr):
+        print(f"{'stage (us)':16}{'count':>9}{'p50':>10}{'p90':>10}{'p99':>10}{'p99.9':>10}{'max':>10}", file=out)
+        histograms, counters = self._tables()
+        for name, h in histograms:
+            s = h.summary()
+            if not s["count"]:
+                continue
+            print(f"{name:16}{s['count']:9}{s['p50']:10.1f}{s['p90']:10.1f}{s['p99']:10.1f}"
+                  f"{s['p99.9']:10.1f}{s['max']:10.1f}", file=out)
+        for name, n in counters:
+            print(f"{name:16}{n:9}", file=out)
+        out.flush()
+
+def install_dump_signal(metrics, signum=getattr(signal, "SIGUSR1", None)):
+    # no SIGUSR1 on Windows, use the status socket there
+    if signum is None:
+        return False
+    signal.signal(signum, lambda *_: metrics.report())
+    return True
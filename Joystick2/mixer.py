@@ -0,0 +1,67 @@
+# mixer.py
+# Merges the gimbal outputs of every connected device into the one channel
+# vector that goes out as PPM, once per control tick.
+#   priority: the highest priority device that's connected drives every channel
+#   sum:      per channel sum, clamped to -1..1 (two pads nudging the same stick)
+#   max_abs:  per channel, whichever device is pushing hardest wins
+# Throttle is never summed or compared: -1 is "off", so off (-1) + armed (+1)
+# would come out as half throttle. In every mode it comes from the priority
+# device unless channel_sources says otherwise.
+# channel_sources pins individual channels to a device regardless of mode,
+# e.g. {0: "drum"} to always take throttle from the drum kit.
+MIX_MODES = ("priority", "sum", "max_abs")
+THROTTLE = 0 #channel index
+
+class ChannelMixer:
+    def __init__(self, mode="priority", priorities=(), channel_sources=None):
+        if mode not in MIX_MODES:
+            raise ValueError(f"unknown mix mode {mode!r}, expected one of {MIX_MODES}")
+        self.mode = mode
+        # device name substrings (lowercase) in priority order; devices that
+        # match none of them rank after, in the order they were plugged in
+        self.priorities = tuple(p.lower() for p in priorities)
+        self.channel_sources = {ch: name.lower() for ch, name in (channel_sources or {}).items()}
+
+    def rank(self, name):
+        name = name.lower()
+        for i, pattern in enumerate(self.priorities):
+            if pattern in name:
+                return i
+        return len(self.priorities)
+
+    def mix(self, sources):
+        # sources: list of (device name, channels tuple), in plug-in order.
+        # Returns the merged channels tuple, or None with nothing connected.
+        if not sources:
+            return None
+        if len(sources) == 1 and not self.channel_sources:
+            return sources[0][1]
+
+        width = max(len(channels) for _, channels in sources)
+        # sorted() is stable, so ties keep plug-in order
+        best = sorted(sources, key=lambda source: self.rank(source[0]))[0][1]
+        if self.mode == "priority":
+            out = list(best) + [0] * (width - len(best))
+        elif self.mode == "sum":
+            out = [0.0] * width
+            for _, channels in sources:
+                for i, value in enumerate(channels):
+                    out[i] += value
+            out = [-1.0 if v < -1.0 else 1.0 if v > 1.0 else v for v in out]
+        else: #max_abs
+            out = [0.0] * width
+            for _, channels in sources:
+                for i, value in enumerate(channels):
+                    if abs(value) > abs(out[i]):
+                        out[i] = value
+        if self.mode != "priority" and len(best) > THROTTLE:
+            out[THROTTLE] = best[THROTTLE]
+
+        for ch, pattern in self.channel_sources.items():
+            for name, channels in sources:
+                if pattern in name.lower() and ch < len(channels):
+                    if ch >= len(out):
+                        out += [0] * (ch + 1 - len(out))
+                    out[ch] = channels[ch]
+                    break
+        return tuple(out)
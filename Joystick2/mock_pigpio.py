@@ -0,0 +1,206 @@
+# mock_pigpio.py
+# Stand-in for the pigpio module + daemon so the output path can run headless
+# (CI box, laptop). Implements the subset of pigpio.pi we use, records every
+# call with a monotonic_ns timestamp, and models pigpiod's wave memory limits
+# and REPEAT_SYNC frame switching so wave churn and stick-to-air latency can be
+# measured off-device.
+#   import mock_pigpio as pigpio   (or JOYSTICK_MOCK_PIGPIO=1, see config.py)
+import time
+from collections import namedtuple
+
+OUTPUT = 1
+INPUT = 0
+
+WAVE_MODE_ONE_SHOT = 0
+WAVE_MODE_REPEAT = 1
+WAVE_MODE_ONE_SHOT_SYNC = 2
+WAVE_MODE_REPEAT_SYNC = 3
+
+# pigpiod's limits (DMA control blocks, pulses, micros, wave ids)
+MAX_PULSES = 12000
+MAX_CBS = 25016
+MAX_MICROS = 1800000000
+MAX_WAVES = 250
+
+# pigpio's error codes for the failures we model
+PI_BAD_WAVE_ID = -66
+PI_TOO_MANY_CBS = -67
+PI_TOO_MANY_PULSES = -36
+PI_NO_WAVEFORM_ID = -101
+PI_EMPTY_WAVEFORM = -69
+
+pulse = namedtuple("pulse", "gpio_on gpio_off delay")
+
+class error(Exception):
+    def __init__(self, value):
+        super().__init__(value)
+        self.value = value
+
+Wave = namedtuple("Wave", "pulses cbs micros reserved_pulses reserved_cbs")
+Call = namedtuple("Call", "t_ns name args")
+Send = namedtuple("Send", "t_ns on_air_ns wid") #on_air_ns: when the wave actually starts
+
+def _cbs(pulses):
+    # pigpiod uses roughly one CB for the level change and one for the delay
+    return 2 * len(pulses)
+
+class pi:
+    def __init__(self, host="localhost", port=8888, show_errors=True, clock=time.monotonic_ns):
+        self.connected = True
+        self.clock = clock
+        self.calls = [] #every Call made, in order
+        self.sends = [] #every Send, for latency measurement
+        self.modes = {}
+        self.levels = {}
+        self.pending = [] #pulses added but not yet wave_create'd
+        self.waves = {} #wid -> Wave
+        self.created = 0
+        self.deleted = 0
+        self.peak_waves = 0
+        self.deleted_on_air = 0 #deletes of a wave still transmitting/queued (a glitch on real hw)
+        # transmitter: which wave is repeating, since when, and what's queued
+        self.tx_wid = None
+        self.tx_start_ns = 0
+        self.tx_next = None #(wid, switch_ns) waiting on REPEAT_SYNC
+
+    def _record(self, name, *args):
+        self.calls.append(Call(self.clock(), name, args))
+
+    def _used(self):
+        pulses = sum(max(w.pulses, w.reserved_pulses) for w in self.waves.values())
+        cbs = sum(max(w.cbs, w.reserved_cbs) for w in self.waves.values())
+        return pulses, cbs
+
+    def _frame_ns(self, wid):
+        return max(1, self.waves[wid].micros) * 1000
+
+    def _advance(self):
+        # apply a queued REPEAT_SYNC switch once its frame boundary has passed
+        if self.tx_next is not None and self.clock() >= self.tx_next[1]:
+            self.tx_wid, self.tx_start_ns = self.tx_next
+            self.tx_next = None
+
+    # GPIO
+    def set_mode(self, gpio, mode):
+        self._record("set_mode", gpio, mode)
+        self.modes[gpio] = mode
+        return 0
+    def write(self, gpio, level):
+        self._record("write", gpio, level)
+        self.levels[gpio] = level
+        return 0
+    def stop(self):
+        self._record("stop")
+        self.connected = False
+
+    # waves
+    def wave_clear(self):
+        self._record("wave_clear")
+        self.pending = []
+        self.waves = {}
+        self.tx_wid = self.tx_next = None
+        return 0
+    def wave_add_new(self):
+        self._record("wave_add_new")
+        self.pending = []
+        return 0
+    def wave_add_generic(self, pulses):
+        self._record("wave_add_generic", len(pulses))
+        self.pending = self.pending + list(pulses)
+        return len(self.pending)
+
+    def _create(self, name, percent):
+        pulses = self.pending
+        self._record(name, len(pulses), percent)
+        if not pulses:
+            raise error(PI_EMPTY_WAVEFORM)
+        used_pulses, used_cbs = self._used()
+        reserved_pulses = MAX_PULSES * percent // 100
+        reserved_cbs = MAX_CBS * percent // 100
+        if used_pulses + max(len(pulses), reserved_pulses) > MAX_PULSES:
+            raise error(PI_TOO_MANY_PULSES)
+        if used_cbs + max(_cbs(pulses), reserved_cbs) > MAX_CBS:
+            raise error(PI_TOO_MANY_CBS)
+        wid = next((i for i in range(MAX_WAVES) if i not in self.waves), None)
+        if wid is None:
+            raise error(PI_NO_WAVEFORM_ID)
+        micros = sum(p.delay for p in pulses)
+        self.waves[wid] = Wave(len(pulses), _cbs(pulses), micros, reserved_pulses, reserved_cbs)
+        self.pending = []
+        self.created += 1
+        self.peak_waves = max(self.peak_waves, len(self.waves))
+        return wid
+    def wave_create(self):
+        return self._create("wave_create", 0)
+    def wave_create_and_pad(self, percent):
+        return self._create("wave_create_and_pad", percent)
+
+    def wave_delete(self, wave_id):
+        self._record("wave_delete", wave_id)
+        if wave_id not in self.waves:
+            raise error(PI_BAD_WAVE_ID)
+        self._advance()
+        if wave_id == self.tx_wid or (self.tx_next is not None and wave_id == self.tx_next[0]):
+            self.deleted_on_air += 1
+        del self.waves[wave_id]
+        self.deleted += 1
+        return 0
+
+    def wave_send_repeat(self, wave_id):
+        return self.wave_send_using_mode(wave_id, WAVE_MODE_REPEAT)
+    def wave_send_using_mode(self, wave_id, mode):
+        self._record("wave_send_using_mode", wave_id, mode)
+        if wave_id not in self.waves:
+            raise error(PI_BAD_WAVE_ID)
+        now = self.clock()
+        self._advance()
+        if mode in (WAVE_MODE_REPEAT_SYNC, WAVE_MODE_ONE_SHOT_SYNC) and self.tx_wid is not None:
+            # new wave starts where the current repetition ends
+            frame = self._frame_ns(self.tx_wid)
+            switch = self.tx_start_ns + ((now - self.tx_start_ns) // frame + 1) * frame
+            self.tx_next = (wave_id, switch)
+        else:
+            self.tx_wid, self.tx_start_ns, self.tx_next = wave_id, now, None
+            switch = now
+        self.sends.append(Send(now, switch, wave_id))
+        return self.waves[wave_id].micros
+    def wave_tx_stop(self):
+        self._record("wave_tx_stop")
+        self.tx_wid = self.tx_next = None
+        return 0
+    def wave_tx_busy(self):
+        self._record("wave_tx_busy")
+        return int(self.tx_wid is not None)
+    def wave_tx_at(self):
+        self._record("wave_tx_at")
+        self._advance()
+        return 9999 if self.tx_wid is None else self.tx_wid #9999 = WAVE_NOT_FOUND
+
+    # resource accounting, same names as pigpio
+    def wave_get_pulses(self):
+        self._record("wave_get_pulses")
+        return self._used()[0]
+    def wave_get_max_pulses(self):
+        self._record("wave_get_max_pulses")
+        return MAX_PULSES
+    def wave_get_cbs(self):
+        self._record("wave_get_cbs")
+        return self._used()[1]
+    def wave_get_max_cbs(self):
+        self._record("wave_get_max_cbs")
+        return MAX_CBS
+    def wave_get_micros(self):
+        self._record("wave_get_micros")
+        return sum(w.micros for w in self.waves.values())
+    def wave_get_max_micros(self):
+        self._record("wave_get_max_micros")
+        return MAX_MICROS
+
+    # helpers for benchmarks, not part of pigpio
+    def call_counts(self):
+        counts = {}
+        for call in self.calls:
+            counts[call.name] = counts.get(call.name, 0) + 1
+        return counts
+    def latencies_ns(self):
+        return [s.on_air_ns - s.t_ns for s in self.sends]
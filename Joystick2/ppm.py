@@ -0,0 +1,336 @@
+# ppm.py
+# PPM output engine on top of pigpio's wave API.
+#
+# Every update used to allocate a brand new wave and delete the one from two
+# generations back, so pigpiod wave memory was handed out and freed constantly.
+# Here exactly two wave slots are used, created with wave_create_and_pad so
+# each one owns a fixed share of the daemon's pulse/CB memory and a re-created
+# wave lands back in the same slot. An update is always: delete the idle slot,
+# add the new pulses, create it, send with REPEAT_SYNC - four daemon calls, no
+# growth.
+#
+# A third share holds the failsafe frame, uploaded once at start and never
+# deleted, so falling back to it is a single wave_send_using_mode call with
+# nothing to encode, allocate or wait for.
+#
+# Every wave goes through a WaveLedger, so the ids we hold are always known:
+# anything not in a slot (an update that failed half way) is deleted again
+# rather than slowly eating the daemon's wave memory.
+import time
+import logging
+import threading
+logger = logging.getLogger(__name__)
+
+WAVE_PAD_PERCENT = 33 #two data slots + the failsafe wave, a third of the wave resources each
+OWNED_WAVES = 3 #two slots + failsafe, more in the ledger means something leaked
+
+# Shape of one PPM frame. Every channel is a sync (separator) pulse followed by
+# the rest of its slot, and the frame ends with a final sync pulse plus a gap
+# long enough for the receiver to spot the start of the next frame.
+#   polarity "negative": line idles high, sync pulses pull it low (what we've
+#   always sent); "positive": the opposite
+class PPMFrameSpec:
+    def __init__(self, channels=8, frame_us=22500, sync_us=300, polarity="negative",
+                 min_us=1000, max_us=2000, min_gap_us=4000):
+        self.channels = channels
+        self.frame_us = frame_us
+        self.sync_us = sync_us
+        self.polarity = polarity
+        self.min_us = min_us
+        self.max_us = max_us
+        self.min_gap_us = min_gap_us
+        self.center_us = (min_us + max_us) / 2
+        self.half_range_us = (max_us - min_us) / 2
+        self.validate()
+
+    def validate(self):
+        if self.channels < 1:
+            raise ValueError("PPM frame needs at least one channel")
+        if self.polarity not in ("negative", "positive"):
+            raise ValueError(f"unknown PPM polarity {self.polarity!r}")
+        if not 0 < self.sync_us < self.min_us < self.max_us:
+            raise ValueError(f"need 0 < sync_us < min_us < max_us, got {self.sync_us}/{self.min_us}/{self.max_us}")
+        # worst case: every channel at max_us, then the end-of-frame gap
+        needed = self.channels * self.max_us + self.min_gap_us
+        if needed > self.frame_us:
+            raise ValueError(f"{self.channels} channels at up to {self.max_us}us need a {needed}us frame, "
+                             f"{self.frame_us}us is too short")
+
+    def channel_us(self, values):
+        # -1.0..1.0 channel values -> pulse widths in us. Missing channels sit
+        # at center, extra values past the channel count are dropped.
+        center, half, lo, hi = self.center_us, self.half_range_us, self.min_us, self.max_us
+        out = [round(center + half * value) for value in values[:self.channels]]
+        out = [lo if us < lo else hi if us > hi else us for us in out]
+        if len(out) < self.channels:
+            out += [round(center)] * (self.channels - len(out))
+        return tuple(out)
+
+# Turns channel values into pulse timings for one frame, no pigpio needed.
+# Each pulse is an (on_mask, off_mask, delay_us) triple - the same fields, in
+# the same order, as pigpio.pulse - so on the Pi it's just
+#   [pigpio.pulse(*p) for p in encoder.encode(values)]
+class PPMEncoder:
+    def __init__(self, spec, gpio_mask):
+        self.spec = spec
+        self.gpio_mask = gpio_mask
+        # sync pulse drives the line to the "off" level, the rest of the slot to "on"
+        if spec.polarity == "negative":
+            self.sync_on, self.sync_off = 0, gpio_mask
+        else:
+            self.sync_on, self.sync_off = gpio_mask, 0
+        self.sync_pulse = (self.sync_on, self.sync_off, spec.sync_us)
+        # frame ends 1us short so the repeat never overruns frame_us
+        self.tail_us = spec.frame_us - spec.sync_us - 1
+
+    def encode(self, values):
+        return self.encode_us(self.spec.channel_us(values))
+
+    def encode_us(self, channel_us):
+        sync_pulse = self.sync_pulse
+        sync_on, sync_off, sync_us = sync_pulse
+        pulses = []
+        append = pulses.append
+        pos = 0
+        for us in channel_us:
+            append(sync_pulse)
+            append((sync_off, sync_on, us - sync_us))
+            pos += us
+        append(sync_pulse)
+        append((sync_off, sync_on, self.tail_us - pos))
+        return pulses
+
+# Decides whether a new frame is worth a wave update. Compares the quantised
+# pulse widths (ints), not the gimbal floats, so ADC jitter that rounds to the
+# same microsecond costs nothing. Optional extras:
+#   deadband_us: int or per-channel tuple, changes within it are ignored
+#   min_interval_s: never update more often than this
+class PPMUpdateFilter:
+    def __init__(self, deadband_us=0, min_interval_s=0.0):
+        self.deadband_us = deadband_us
+        self.min_interval_s = min_interval_s
+        self.last_us = None
+        self.last_sent = None
+        self.sent = 0
+        self.suppressed_same = 0
+        self.suppressed_deadband = 0
+        self.suppressed_interval = 0
+
+    def wants(self, channel_us, now):
+        last = self.last_us
+        if last is None:
+            return True
+        if channel_us == last:
+            self.suppressed_same += 1
+            return False
+        deadband = self.deadband_us
+        if deadband and len(channel_us) == len(last):
+            if isinstance(deadband, int):
+                moved = any(abs(a - b) > deadband for a, b in zip(channel_us, last))
+            else:
+                moved = any(abs(a - b) > d for a, b, d in zip(channel_us, last, deadband))
+            if not moved:
+                self.suppressed_deadband += 1
+                return False
+        if self.min_interval_s and now - self.last_sent < self.min_interval_s:
+            self.suppressed_interval += 1
+            return False
+        return True
+
+    def reset(self):
+        # forget the last frame so the next one is always sent, e.g. after the
+        # output was switched to failsafe behind our back
+        self.last_us = None
+
+    def mark_sent(self, channel_us, now):
+        self.last_us = channel_us
+        self.last_sent = now
+        self.sent += 1
+
+    def counters(self):
+        return {
+            "sent": self.sent,
+            "suppressed_same": self.suppressed_same,
+            "suppressed_deadband": self.suppressed_deadband,
+            "suppressed_interval": self.suppressed_interval,
+        }
+
+def wave_cbs(pulses):
+    # estimate of the DMA control blocks pigpiod spends on a wave: one for
+    # the level change and one for the delay of each pulse
+    return 2 * len(pulses)
+
+# pigpiod can't list waves, and its wave_get_pulses/cbs/micros only describe
+# the wave being built, so this keeps the books for every wave we create:
+# which ids are ours and how much of the daemon's wave memory they hold.
+class WaveLedger:
+    def __init__(self, pi, pigpio):
+        self.pi = pi
+        self.pigpio = pigpio
+        self.waves = {} #wid -> (pulses, cbs, micros, pad percent)
+        self.limits = None #(max pulses, max cbs, max micros per wave), see fetch_limits
+        self.created = 0
+        self.deleted = 0
+        self.reclaimed = 0
+        self.failures = 0
+
+    def fetch_limits(self):
+        self.limits = (self.pi.wave_get_max_pulses(), self.pi.wave_get_max_cbs(),
+                       self.pi.wave_get_max_micros())
+
+    def create(self, pulses, pad_percent):
+        try:
+            self.pi.wave_add_generic(pulses)
+            wid = self.pi.wave_create_and_pad(pad_percent)
+        except self.pigpio.error:
+            self.failures += 1
+            # the daemon keeps added pulses until a create succeeds, don't let
+            # them end up in front of the next wave
+            self.pi.wave_add_new()
+            raise
+        self.waves[wid] = (len(pulses), wave_cbs(pulses), sum(p.delay for p in pulses), pad_percent)
+        self.created += 1
+        return wid
+
+    def delete(self, wid):
+        try:
+            self.pi.wave_delete(wid)
+        except self.pigpio.error: #already gone on the daemon side, stop tracking it anyway
+            self.failures += 1
+        self.waves.pop(wid, None)
+        self.deleted += 1
+
+    def reclaim(self, keep):
+        # delete every wave we created that isn't in keep. -> number reclaimed
+        leaked = [wid for wid in self.waves if wid not in keep]
+        for wid in leaked:
+            self.delete(wid)
+        if leaked:
+            self.reclaimed += len(leaked)
+            logger.warning("reclaimed %d leaked wave(s): %s", len(leaked), leaked)
+        return len(leaked)
+
+    def usage(self):
+        # pulses/cbs as the daemon reserves them: a padded wave holds its
+        # whole share however short it is. micros is the longest wave, the
+        # daemon's limit is per wave.
+        pulses = cbs = micros = 0
+        for n_pulses, n_cbs, n_micros, pad_percent in self.waves.values():
+            if self.limits:
+                n_pulses = max(n_pulses, self.limits[0] * pad_percent // 100)
+                n_cbs = max(n_cbs, self.limits[1] * pad_percent // 100)
+            pulses += n_pulses
+            cbs += n_cbs
+            micros = max(micros, n_micros)
+        max_pulses, max_cbs, max_micros = self.limits or (None, None, None)
+        return {
+            "waves": len(self.waves),
+            "pulses": pulses, "max_pulses": max_pulses,
+            "cbs": cbs, "max_cbs": max_cbs,
+            "micros": micros, "max_micros": max_micros,
+            "created": self.created, "deleted": self.deleted,
+            "reclaimed": self.reclaimed, "failures": self.failures,
+        }
+
+class PPMOutput:
+    def __init__(self, pi, pigpio, frame_us=22500, clock=time.monotonic):
+        self.clock = clock
+        self.pi = pi
+        self.pigpio = pigpio
+        self.waves = WaveLedger(pi, pigpio)
+        self.frame_us = frame_us
+        self.slots = [None, None] #wave ids, index 0/1
+        self.active = 0 #slot last sent
+        self.failsafe_wave = None
+        self.on_air = None #wave id last sent
+        self.failsafe_active = False #on the failsafe wave, updates refused until release_failsafe
+        self.lock = threading.Lock() #the watchdog switches to failsafe from its own thread
+        self.last_send = 0.0
+        self.updates = 0
+        self.deferred = 0
+        self.failsafes = 0
+        self.errors = 0
+
+    def start(self, failsafe_pulses, clear=False):
+        # upload the failsafe frame and put it on air with a plain repeat,
+        # nothing to sync against yet. Data slots are filled by update().
+        # clear: wave_clear first, dropping waves an earlier run left in
+        # pigpiod (it outlives us) - only if nothing else uses waves on it.
+        if clear:
+            self.pi.wave_clear()
+        self.waves.fetch_limits()
+        self.failsafe_wave = self.waves.create(failsafe_pulses, WAVE_PAD_PERCENT)
+        self.pi.wave_send_repeat(self.failsafe_wave)
+        self.on_air = self.failsafe_wave
+        self.last_send = self.clock()
+
+    def engage_failsafe(self):
+        # switch to the pre-uploaded failsafe wave at the end of the current
+        # frame. No slot is deleted, so there is no hold-off to wait for.
+        with self.lock:
+            if self.failsafe_active:
+                return
+            self.failsafe_active = True
+            self.failsafes += 1
+            if self.on_air == self.failsafe_wave: #nothing sent since start
+                return
+            self.pi.wave_send_using_mode(self.failsafe_wave, self.pigpio.WAVE_MODE_REPEAT_SYNC)
+            self.on_air = self.failsafe_wave
+            self.last_send = self.clock()
+
+    def release_failsafe(self):
+        # let update() take over again; the failsafe frame stays on air until it does
+        self.failsafe_active = False
+
+    def update(self, pulses):
+        with self.lock:
+            if self.failsafe_active:
+                return False
+            return self._update(pulses)
+
+    def _update(self, pulses):
+        # REPEAT_SYNC only switches over at the end of the current frame, so the
+        # idle slot may still be on the wire for up to one frame after the last
+        # send. Don't delete it until then; the caller just retries next tick.
+        if self.clock() - self.last_send < self.frame_us / 1e6:
+            self.deferred += 1
+            return False
+
+        idle = 1 - self.active
+        try:
+            if self.slots[idle] is not None:
+                wid, self.slots[idle] = self.slots[idle], None
+                self.waves.delete(wid)
+            self.slots[idle] = self.waves.create(pulses, WAVE_PAD_PERCENT)
+            self.pi.wave_send_using_mode(self.slots[idle], self.pigpio.WAVE_MODE_REPEAT_SYNC)
+        except self.pigpio.error as e:
+            # the previous frame keeps repeating; retry next tick with whatever
+            # wave memory a failed create/send may have stranded given back
+            self.errors += 1
+            logger.warning("PPM update failed: %s", e)
+            self.reclaim()
+            return False
+        if len(self.waves.waves) > OWNED_WAVES:
+            self.reclaim()
+        self.active = idle
+        self.on_air = self.slots[idle]
+        self.last_send = self.clock()
+        self.updates += 1
+        return True
+
+    def reclaim(self):
+        # give back every wave of ours that no slot refers to
+        return self.waves.reclaim({self.failsafe_wave, *self.slots} - {None})
+
+    def usage(self):
+        usage = self.waves.usage()
+        usage.update(updates=self.updates, deferred=self.deferred, failsafes=self.failsafes, errors=self.errors)
+        return usage
+
+    def stop(self):
+        self.pi.wave_tx_stop()
+        for wid in list(self.waves.waves):
+            self.waves.delete(wid)
+        self.slots = [None, None]
+        self.failsafe_wave = None
+        self.on_air = None
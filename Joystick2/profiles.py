@@ -0,0 +1,217 @@
+# profiles.py
+# Data-only device support. A profile (profiles/*.json, or *.toml) says which
+# joysticks it's for, names their axes/buttons/hats, and describes each PPM
+# channel as a filter over those inputs. At load time it's checked and
+# compiled into plain closures reading the JoystickState lists directly, so a
+# tick is one call per channel with no per-button method lookups.
+#
+#   {
+#     "name": "Xbox 360 Controller",
+#     "match": {"guid": ["030000005e0400008e02000014010000"], "name": "xbox"},
+#     "inputs": {"lt": {"axis": 2}, "a": {"button": 0}, "strum": {"hat": 0, "index": 1}},
+#     "platforms": {"windows": {"inputs": {"lt": {"axis": 4}}}},
+#     "channels": {"throttle": {"input": "lt"}, "ail": {...}, "elev": {...},
+#                  "rudder": {...}, "aux": [{...}, ...]}
+#   }
+#
+# match.name is a case-insensitive regex searched in the joystick name; any
+# listed GUID matches outright. Channel filters (key "filter", default direct):
+#   direct      input * scale + offset
+#   calibrated  remap via "calibration": [inMin, inMax, inMid, outMin, outMax, outMid]
+#   hold        update_hold_pressure over "positive"/"negative" inputs
+#   hold_multi  update_hold_pressure_multi, last pressed direction wins
+#   hit         update_hit_pressure, "window" seconds / "max_hits"
+#   select      "set": [[input, value], ...], first pressed wins, else keeps
+#               the last value (starts at "initial")
+# hold/hold_multi/hit take "max" (force), "growth" and "decay" (per second).
+import os
+import re
+import json
+import glob
+import logging
+from config import get_system
+from filters import (AxisCalibration, update_hold_pressure, update_hold_pressure_multi,
+                     HitRateTracker, update_hit_pressure)
+try:
+    import tomllib #3.11+
+except ImportError:
+    tomllib = None
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles")
+CHANNEL_NAMES = ("throttle", "ail", "elev", "rudder")
+FILTERS = ("direct", "calibrated", "hold", "hold_multi", "hit", "select")
+
+class ProfileError(ValueError):
+    pass
+
+def _check_index(spec, key, values):
+    i = spec[key]
+    if not isinstance(i, int) or not 0 <= i < len(values):
+        raise ProfileError(f"{key} {i!r} doesn't exist, the device has {len(values)}")
+    return i
+
+def _compile_input(spec, state):
+    # -> zero-arg reader over the JoystickState lists
+    if "axis" in spec:
+        axes, i, scale = state.axes, _check_index(spec, "axis", state.axes), spec.get("scale", 1)
+        if scale == 1:
+            return lambda: axes[i]
+        return lambda: axes[i] * scale
+    if "button" in spec:
+        buttons, i = state.buttons, _check_index(spec, "button", state.buttons)
+        return lambda: buttons[i]
+    if "hat" in spec:
+        hats, i, index = state.hats, _check_index(spec, "hat", state.hats), spec.get("index", 1)
+        if "equals" in spec:
+            equals = spec["equals"]
+            return lambda: hats[i][index] == equals
+        return lambda: hats[i][index]
+    raise ProfileError(f"input needs an axis, button or hat: {spec}")
+
+def _compile_channel(spec, read, clock_ns):
+    # -> fn(dt) returning the channel value, state kept in the closure
+    kind = spec.get("filter", "direct")
+    scale = spec.get("scale", 1)
+
+    if kind == "direct":
+        source, offset = read(spec["input"]), spec.get("offset", 0)
+        return lambda dt: source() * scale + offset
+
+    if kind == "calibrated":
+        source, cal = read(spec["input"]), AxisCalibration(*spec["calibration"])
+        return lambda dt: cal(source()) * scale
+
+    if kind == "select":
+        choices = [(read(name), value) for name, value in spec["set"]]
+        current = [spec.get("initial", -1)]
+        def select(dt):
+            for pressed, value in choices:
+                if pressed():
+                    current[0] = value
+                    break
+            return current[0]
+        return select
+
+    positive, negative = read(spec["positive"]), read(spec["negative"])
+    max_force, growth, decay = spec.get("max", 1.0), spec["growth"], spec["decay"]
+    pressure = [0.0]
+
+    if kind == "hold":
+        def hold(dt):
+            pressure[0] = update_hold_pressure(pressure[0], positive(), negative(),
+                                               max_force, growth, decay, dt)
+            return pressure[0] * scale
+        return hold
+
+    if kind == "hold_multi":
+        last_pressed = [None]
+        def hold_multi(dt):
+            pressure[0], last_pressed[0] = update_hold_pressure_multi(
+                pressure[0], positive(), negative(), max_force, growth, decay, last_pressed[0], dt)
+            return pressure[0] * scale
+        return hold_multi
+
+    if kind == "hit":
+        tracker = HitRateTracker(window=spec.get("window", 1.0), max_hits=spec.get("max_hits", 10))
+        def hit(dt):
+            pressure[0] = update_hit_pressure(pressure[0], positive(), negative(),
+                                              max_force, growth, decay, tracker, dt, clock_ns())
+            return pressure[0] * scale
+        return hit
+
+    raise ProfileError(f"unknown filter {kind!r}, expected one of {FILTERS}")
+
+def _channel_inputs(spec):
+    # every input name a channel spec refers to, for load-time checking
+    names = [spec[key] for key in ("input", "positive", "negative") if key in spec]
+    names += [name for name, _ in spec.get("set", ())]
+    return names
+
+class _ProbeState:
+    # stands in for a JoystickState at load time: big enough for any index a
+    # real device could have, everything at rest
+    def __init__(self, size=256):
+        self.axes = [0.0] * size
+        self.buttons = [0] * size
+        self.hats = [(0, 0)] * size
+
+class CompiledProfile:
+    def __init__(self, data, source="<profile>", system=None):
+        self.source = source
+        try:
+            self.name = data["name"]
+            match = data.get("match", {})
+            self.guids = frozenset(g.lower() for g in match.get("guid", ()))
+            self.name_re = re.compile(match["name"], re.IGNORECASE) if "name" in match else None
+            inputs = dict(data["inputs"])
+            system = system or get_system()
+            inputs.update(data.get("platforms", {}).get(system, {}).get("inputs", {}))
+            self.inputs = inputs
+            channels = data["channels"]
+            self.channels = [channels.get(name) for name in CHANNEL_NAMES]
+            self.aux = list(channels.get("aux", ()))
+        except (KeyError, TypeError, re.error) as e:
+            raise ProfileError(f"{source}: bad profile: {e!r}") from e
+        if not self.guids and self.name_re is None:
+            raise ProfileError(f"{source}: profile matches nothing, give match.guid or match.name")
+        for spec in self.channels + self.aux:
+            if spec is None:
+                continue
+            if spec.get("filter", "direct") not in FILTERS:
+                raise ProfileError(f"{source}: unknown filter {spec['filter']!r}, expected one of {FILTERS}")
+            for name in _channel_inputs(spec):
+                if name not in self.inputs:
+                    raise ProfileError(f"{source}: channel uses undefined input {name!r}")
+        # compile and run every channel once now, so a missing key or a bad
+        # value fails here and not when a device is plugged in
+        probe = _ProbeState()
+        try:
+            for name, spec in self.inputs.items():
+                try:
+                    _compile_input(spec, probe)
+                except ProfileError as e:
+                    raise ProfileError(f"input {name!r}: {e}") from e
+            for fn in self.build(probe, clock_ns=lambda: 0):
+                fn(0.01)
+        except ProfileError as e:
+            raise ProfileError(f"{source}: {e}") from e
+        except Exception as e:
+            raise ProfileError(f"{source}: bad channel: {e!r}") from e
+
+    def build(self, state, clock_ns=lambda: None):
+        # one set of channel closures per connected device. Returns the
+        # dispatch table: [throttle, ail, elev, rudder, *aux], each fn(dt).
+        # clock_ns gives the current sample time to time-keeping filters
+        # (None = use time.monotonic_ns)
+        readers = {}
+        def read(name):
+            if name not in readers:
+                readers[name] = _compile_input(self.inputs[name], state)
+            return readers[name]
+        centered = lambda dt: 0
+        table = [_compile_channel(spec, read, clock_ns) if spec else centered for spec in self.channels]
+        table += [_compile_channel(spec, read, clock_ns) for spec in self.aux]
+        return table
+
+def load_profile(path, system=None):
+    if path.endswith(".toml"):
+        if tomllib is None:
+            raise ProfileError(f"{path}: TOML profiles need Python 3.11+")
+        with open(path, "rb") as f:
+            data = tomllib.load(f)
+    else:
+        with open(path) as f:
+            data = json.load(f)
+    return CompiledProfile(data, source=path, system=system)
+
+def load_profiles(directory=PROFILE_DIR, system=None):
+    # a broken profile is logged and skipped rather than taking the rest down
+    profiles = []
+    paths = sorted(glob.glob(os.path.join(directory, "*.json")) + glob.glob(os.path.join(directory, "*.toml")))
+    for path in paths:
+        try:
+            profiles.append(load_profile(path, system))
+        except (OSError, ValueError) as e:
+            logger.warning("skipping profile %s: %s", path, e)
+    return profiles
@@ -0,0 +1,216 @@
+# recording.py
+# Record live joystick input to a compact binary log and replay it later,
+# deterministically and as fast as the CPU allows, through the same gimbal
+# code the transmitter runs.
+#
+# Log layout: MAGIC, then records of  <type:u8> <jid:u16> <t_ns:u64>  + payload
+#   ADD     name (u16 len + utf8), guid (u8 len + ascii), naxes/nbuttons/nhats
+#           (u8 each), then the full initial state: f32 axes, u8 buttons, i8 hat pairs
+#   REMOVE  -
+#   AXIS    index u8, value f32
+#   BUTTON  index u8, value u8
+#   HAT     index u8, x i8, y i8
+# t_ns is nanoseconds since the recording started.
+#
+#   python recording.py replay session.jsrec [rate_hz]
+import sys
+import time
+import struct
+import logging
+from input_state import JoystickState, JoystickSurface
+from profiles import ProfileError
+
+MAGIC = b"JSREC1\n"
+ADD, REMOVE, AXIS, BUTTON, HAT = range(5)
+HEADER = struct.Struct("<BHQ")
+AXIS_PAYLOAD = struct.Struct("<Bf")
+BUTTON_PAYLOAD = struct.Struct("<BB")
+HAT_PAYLOAD = struct.Struct("<Bbb")
+FLUSH_NS = 1_000_000_000 #a crash loses at most this much of the recording
+logger = logging.getLogger(__name__)
+
+class InputRecorder:
+    def __init__(self, path, clock_ns=time.monotonic_ns):
+        self.file = open(path, "wb")
+        self.file.write(MAGIC)
+        self.clock_ns = clock_ns
+        self.t0 = clock_ns()
+        self.flushed_ns = 0
+
+    def _header(self, kind, jid):
+        t_ns = self.clock_ns() - self.t0
+        if t_ns - self.flushed_ns >= FLUSH_NS:
+            # flush whatever came before this record, so the file only ever
+            # ends mid-record if the program dies between flushes
+            self.file.flush()
+            self.flushed_ns = t_ns
+        self.file.write(HEADER.pack(kind, jid, t_ns))
+
+    def add(self, state):
+        self._header(ADD, state.get_instance_id())
+        name = state.get_name().encode()
+        guid = state.get_guid().encode()
+        self.file.write(struct.pack("<H", len(name)) + name + struct.pack("<B", len(guid)) + guid)
+        self.file.write(struct.pack("<BBB", len(state.axes), len(state.buttons), len(state.hats)))
+        self.file.write(struct.pack(f"<{len(state.axes)}f", *state.axes))
+        self.file.write(bytes(state.buttons))
+        for x, y in state.hats:
+            self.file.write(struct.pack("<bb", x, y))
+    def remove(self, jid):
+        self._header(REMOVE, jid)
+    def axis(self, jid, index, value):
+        self._header(AXIS, jid)
+        self.file.write(AXIS_PAYLOAD.pack(index, value))
+    def button(self, jid, index, value):
+        self._header(BUTTON, jid)
+        self.file.write(BUTTON_PAYLOAD.pack(index, value))
+    def hat(self, jid, index, value):
+        self._header(HAT, jid)
+        self.file.write(HAT_PAYLOAD.pack(index, *value))
+
+    def close(self):
+        self.file.close()
+
+def read_log(path):
+    # -> list of (t_ns, kind, jid, payload). A recording cut off mid-record
+    # (the recorder was killed) keeps every complete record before the cut.
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{path} is not an input recording")
+    records = []
+    pos = len(MAGIC)
+    while pos < len(data):
+        try:
+            record, end = _read_record(data, pos)
+        except (struct.error, IndexError, UnicodeDecodeError):
+            end = len(data) + 1
+        if end > len(data):
+            logger.warning("%s: truncated record at byte %d, replaying the %d before it",
+                           path, pos, len(records))
+            break
+        if record is None:
+            raise ValueError(f"{path}: unknown record type {data[pos]} at byte {pos}")
+        records.append(record)
+        pos = end
+    return records
+
+def _read_record(data, pos):
+    # -> ((t_ns, kind, jid, payload), end position), or (None, pos) for an
+    # unknown record type. The end can be past len(data) when truncated.
+    kind, jid, t_ns = HEADER.unpack_from(data, pos)
+    pos += HEADER.size
+    if kind == ADD:
+        (name_len,) = struct.unpack_from("<H", data, pos)
+        pos += 2
+        name = data[pos:pos + name_len].decode()
+        pos += name_len
+        guid_len = data[pos]
+        guid = data[pos + 1:pos + 1 + guid_len].decode()
+        pos += 1 + guid_len
+        naxes, nbuttons, nhats = struct.unpack_from("<BBB", data, pos)
+        pos += 3
+        axes = list(struct.unpack_from(f"<{naxes}f", data, pos))
+        pos += 4 * naxes
+        buttons = list(data[pos:pos + nbuttons])
+        pos += nbuttons
+        hats = [struct.unpack_from("<bb", data, pos + 2 * i) for i in range(nhats)]
+        pos += 2 * nhats
+        payload = (name, guid, axes, buttons, hats)
+    elif kind == REMOVE:
+        payload = None
+    elif kind == AXIS:
+        payload = AXIS_PAYLOAD.unpack_from(data, pos)
+        pos += AXIS_PAYLOAD.size
+    elif kind == BUTTON:
+        payload = BUTTON_PAYLOAD.unpack_from(data, pos)
+        pos += BUTTON_PAYLOAD.size
+    elif kind == HAT:
+        index, x, y = HAT_PAYLOAD.unpack_from(data, pos)
+        payload = (index, (x, y))
+        pos += HAT_PAYLOAD.size
+    else:
+        return None, pos
+    return (t_ns, kind, jid, payload), pos
+
+class ReplayJoystick(JoystickSurface):
+    # stands in for pygame.joystick.Joystick, fed from a recording
+    def __init__(self, jid, name, guid, axes, buttons, hats):
+        self.jid = jid
+        self.name = name
+        self.guid = guid
+        self.axes = list(axes)
+        self.buttons = list(buttons)
+        self.hats = list(hats)
+
+class ReplaySession:
+    def __init__(self, path, gimbal_factory):
+        self.records = read_log(path)
+        self.gimbal_factory = gimbal_factory
+        self.joysticks = {} #jid -> ReplayJoystick
+        self.states = {} #jid -> JoystickState the gimbals read
+        self.gimbals = {}
+
+    def _apply(self, kind, jid, payload):
+        if kind == ADD:
+            joystick = ReplayJoystick(jid, *payload)
+            self.joysticks[jid] = joystick
+            self.states[jid] = JoystickState(joystick)
+            try:
+                self.gimbals[jid] = self.gimbal_factory(self.states[jid])
+            except ProfileError as e: #same as live: the device drives nothing
+                logger.warning("no gimbal for %s: %s", joystick.get_name(), e)
+        elif kind == REMOVE:
+            self.joysticks.pop(jid, None)
+            self.states.pop(jid, None)
+            self.gimbals.pop(jid, None)
+        elif jid in self.states:
+            index, value = payload
+            if kind == AXIS:
+                self.joysticks[jid].axes[index] = value
+                self.states[jid].set_axis(index, value)
+            elif kind == BUTTON:
+                self.joysticks[jid].buttons[index] = value
+                self.states[jid].set_button(index, value)
+            elif kind == HAT:
+                self.joysticks[jid].hats[index] = value
+                self.states[jid].set_hat(index, value)
+
+    def run(self, rate_hz=100):
+        # steps recorded time in control ticks, applying every input that
+        # happened up to each tick, and yields (t seconds, {jid: GimbalSample}).
+        # The last tick is the first one at or after the final record, so the
+        # final inputs (a trailing REMOVE too) always get evaluated.
+        # Nothing sleeps, so it runs as fast as the gimbals can be evaluated.
+        if not self.records:
+            return
+        tick_ns = int(1e9 / rate_hz)
+        end_ns = self.records[-1][0]
+        i = 0
+        t_ns = 0
+        while t_ns < end_ns + tick_ns:
+            while i < len(self.records) and self.records[i][0] <= t_ns:
+                _, kind, jid, payload = self.records[i]
+                self._apply(kind, jid, payload)
+                i += 1
+            t = t_ns / 1e9
+            yield t, {jid: gimbal.sample(now=t) for jid, gimbal in self.gimbals.items()}
+            t_ns += tick_ns
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] != "replay":
+        sys.exit("usage: python recording.py replay LOG [rate_hz]")
+    from joystick2 import gimbal_factory
+    rate_hz = float(sys.argv[3]) if len(sys.argv) > 3 else 100
+    session = ReplaySession(sys.argv[2], gimbal_factory)
+    ticks = 0
+    t = 0.0 #stays 0 for a recording with no records
+    start = time.perf_counter()
+    for t, samples in session.run(rate_hz):
+        ticks += 1
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    print(f"{len(session.records)} records, {ticks} ticks of {t:.1f}s recorded time "
+          f"in {elapsed:.3f}s ({ticks / elapsed:.0f} ticks/s, {t / elapsed:.0f}x real time)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# registry.py
+# Maps a joystick to the gimbal that should drive it. Exact GUIDs live in a
+# dict, so known hardware resolves in O(1); anything else walks the name
+# matchers once and the answer is cached per (guid, name), so a device that
+# is unplugged and replugged never pays for the walk again.
+#
+# Third party gimbals can plug in through the "joystick_to_ppm.gimbals" entry
+# point group: each entry point is a callable taking the registry, e.g.
+#   [project.entry-points."joystick_to_ppm.gimbals"]
+#   flight_stick = "my_pkg.gimbals:register"
+#   def register(registry):
+#       registry.register(FlightStick_Gimbal, guids=["0300..."], names=["t.flight"])
+import logging
+logger = logging.getLogger(__name__)
+
+ENTRY_POINT_GROUP = "joystick_to_ppm.gimbals"
+
+class GimbalRegistry:
+    def __init__(self, default=None):
+        self.by_guid = {} #guid -> factory(joystick)
+        self.name_matchers = [] #(predicate(lowercase name), factory), first match wins
+        self.default = default
+        self.resolved = {} #(guid, name) -> factory
+
+    def register(self, factory, guids=(), names=(), matcher=None):
+        # factory is a gimbal class or any callable(joystick) -> SimGimbal.
+        # names are lowercase substrings of the joystick name, matcher an
+        # arbitrary predicate over the lowercased name.
+        for guid in guids:
+            self.by_guid[guid.lower()] = factory
+        for name in names:
+            self.name_matchers.append((lambda n, s=name.lower(): s in n, factory))
+        if matcher is not None:
+            self.name_matchers.append((matcher, factory))
+        self.resolved.clear() #earlier answers may no longer be the best match
+
+    def resolve(self, guid, name):
+        key = (guid, name)
+        factory = self.resolved.get(key)
+        if factory is not None:
+            return factory
+        factory = self.by_guid.get(guid.lower()) if guid else None
+        if factory is None:
+            lowered = name.lower()
+            for matches, candidate in self.name_matchers:
+                if matches(lowered):
+                    factory = candidate
+                    break
+            else:
+                factory = self.default
+        self.resolved[key] = factory
+        return factory
+
+    def create(self, joystick):
+        factory = self.resolve(joystick.get_guid(), joystick.get_name())
+        if factory is None:
+            raise LookupError(f"no gimbal registered for {joystick.get_name()!r}")
+        return factory(joystick)
+
+    def load_plugins(self, group=ENTRY_POINT_GROUP):
+        try:
+            from importlib.metadata import entry_points
+        except ImportError: #before 3.8
+            return
+        try:
+            found = entry_points(group=group)
+        except TypeError: #3.8/3.9 return a dict of groups
+            found = entry_points().get(group, ())
+        for entry_point in found:
+            try:
+                entry_point.load()(self)
+                logger.warning("loaded gimbal plugin %s", entry_point.name)
+            except Exception as e: #a broken plugin shouldn't stop the transmitter
+                logger.warning("gimbal plugin %s failed: %s", entry_point.name, e, exc_info=True)
@@ -0,0 +1,64 @@
+# runtime.py
+# Plumbing for the asyncio runtime (--runtime asyncio). Input, control and PPM
+# output run as separate tasks on one event loop, connected by latest-value
+# channels instead of shared loop state:
+#
+#   input --wake--> control --frames--> output
+#                          \--samples--> any extra sinks
+#
+# A channel holds one value. Publishing never blocks and overwrites whatever
+# a reader hasn't picked up yet, so a slow consumer (a network sink, a
+# logger) only ever skips stale values - it can't back up the control path,
+# and nobody has to be told about a new consumer: it just subscribes.
+import asyncio
+
+class LatestValue:
+    # bounded to one slot: put() replaces an unread value, get() waits for
+    # a value newer than the last one it returned
+    def __init__(self):
+        self.value = None
+        self.version = 0
+        self.read_version = 0
+        self.changed = asyncio.Event()
+
+    def put(self, value):
+        self.value = value
+        self.version += 1
+        self.changed.set()
+
+    async def get(self):
+        while self.read_version == self.version:
+            self.changed.clear()
+            await self.changed.wait()
+        self.read_version = self.version
+        return self.value
+
+class Topic:
+    # fan-out: each subscriber gets its own LatestValue, so one slow reader
+    # doesn't make the others skip values
+    def __init__(self, name):
+        self.name = name
+        self.subscribers = []
+
+    def subscribe(self):
+        channel = LatestValue()
+        self.subscribers.append(channel)
+        return channel
+
+    def publish(self, value):
+        for channel in self.subscribers:
+            channel.put(value)
+
+async def run_tasks(coroutines):
+    # run every coroutine as a task until the first one returns or
+    # raises; the rest are cancelled and the error (if any) re-raised
+    tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+    try:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    for task in done:
+        if not task.cancelled() and task.exception():
+            raise task.exception()
@@ -0,0 +1,139 @@
+# scheduler.py
+# Fixed-rate tick scheduling for the control loop. Deadlines are absolute
+# monotonic_ns times on a fixed grid, so a late wake-up or a slow tick never
+# shifts the ticks after it (a relative sleep(period) drifts by its own
+# overhead every tick). A tick that overruns its slot is counted as missed
+# and the grid skips ahead instead of bursting to catch up.
+#
+# Real-time mode (--rt) also:
+#   - sleeps with clock_nanosleep(CLOCK_MONOTONIC, TIMER_ABSTIME) where libc has it
+#   - pins the control thread to one core and asks for SCHED_FIFO, if permitted
+#   - turns off automatic cyclic GC and runs collections in the slack after a
+#     tick instead, so a collection never lands in the middle of one
+import os
+import gc
+import time
+import ctypes
+import ctypes.util
+import logging
+logger = logging.getLogger(__name__)
+
+CLOCK_MONOTONIC = 1
+TIMER_ABSTIME = 1
+
+class _timespec(ctypes.Structure):
+    _fields_ = [("tv_sec", ctypes.c_long), ("tv_nsec", ctypes.c_long)]
+
+def _load_clock_nanosleep():
+    # -> fn(deadline_ns) sleeping until an absolute CLOCK_MONOTONIC time, or None
+    if not hasattr(os, "sched_setaffinity"): #not Linux
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        nanosleep = libc.clock_nanosleep
+    except (OSError, AttributeError):
+        return None
+    nanosleep.argtypes = (ctypes.c_int, ctypes.c_int, ctypes.POINTER(_timespec), ctypes.POINTER(_timespec))
+    request = _timespec() #reused, nothing allocated per sleep
+    pointer = ctypes.byref(request)
+    def sleep_until(deadline_ns):
+        request.tv_sec, request.tv_nsec = divmod(deadline_ns, 1_000_000_000)
+        while nanosleep(CLOCK_MONOTONIC, TIMER_ABSTIME, pointer, None) == 4: #EINTR, e.g. SIGUSR1
+            pass
+    return sleep_until
+
+def setup_realtime_thread(cpu=None, priority=None):
+    # call from the thread to tune; pid 0 is the calling thread on Linux.
+    # Failures are only logged, the loop still runs as an ordinary thread.
+    if cpu is not None:
+        try:
+            os.sched_setaffinity(0, {cpu})
+        except (AttributeError, OSError) as e:
+            logger.warning("couldn't pin control thread to cpu %s: %s", cpu, e)
+    if priority is not None:
+        try:
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))
+        except (AttributeError, OSError) as e: #needs root or CAP_SYS_NICE
+            logger.warning("couldn't get SCHED_FIFO priority %s: %s", priority, e)
+
+class DeadlineScheduler:
+    def __init__(self, rate_hz, metrics=None, wake=None, realtime=False, clock_ns=time.monotonic_ns):
+        # wake: optional threading.Event that ends a wait early (input
+        # changed). The early tick is extra, the deadline grid doesn't move.
+        self.period_ns = int(1e9 / rate_hz)
+        self.metrics = metrics
+        self.wake = wake
+        self.clock_ns = clock_ns
+        self.sleep_until = _load_clock_nanosleep() if realtime and wake is None else None
+        self.defer_gc = realtime
+        self.deadline = None
+        self.missed = 0
+
+    def start(self):
+        if self.defer_gc:
+            gc.disable()
+        self.deadline = self.clock_ns() + self.period_ns
+
+    def stop(self):
+        if self.defer_gc:
+            gc.enable()
+
+    def remaining(self):
+        # call once a tick's work is done. -> ns left until the deadline, or
+        # None if the tick overran its slot: that's counted as missed and the
+        # grid moves to the next point ahead, start the next tick right away.
+        # Callers that do their own waiting (the asyncio runtime) use this and
+        # reached() instead of wait().
+        now = self.clock_ns()
+        late = now - self.deadline
+        if late < 0:
+            return -late
+        self.missed += 1
+        if self.metrics:
+            self.metrics.count("deadline_missed")
+            self.metrics.record("deadline_overrun", late)
+        self.deadline += (late // self.period_ns + 1) * self.period_ns
+        return None
+
+    def reached(self):
+        # the wait for the current deadline ended at it (not woken early)
+        if self.metrics:
+            self.metrics.record("wake_late", self.clock_ns() - self.deadline)
+        self.deadline += self.period_ns
+
+    def wait(self):
+        # call once a tick's work is done. -> True on a deadline tick, False
+        # when woken early by the wake event.
+        if self.remaining() is None:
+            if self.wake is not None:
+                self.wake.clear() #this tick already saw the input
+            return True
+        now = self.clock_ns()
+        if self.defer_gc:
+            self._collect_in_slack()
+            now = self.clock_ns()
+        if self.wake is not None:
+            if self.wake.wait(max(0, self.deadline - now) / 1e9):
+                self.wake.clear()
+                return False
+            self.wake.clear()
+        elif self.sleep_until is not None:
+            self.sleep_until(self.deadline)
+        elif self.deadline > now:
+            time.sleep((self.deadline - now) / 1e9)
+        self.reached()
+        return True
+
+    def _collect_in_slack(self):
+        # the automatic collector's own thresholds, but only run between ticks
+        counts, thresholds = gc.get_count(), gc.get_threshold()
+        generation = -1
+        for gen in range(3):
+            if thresholds[gen] and counts[gen] > thresholds[gen]:
+                generation = gen
+        if generation < 0:
+            return
+        t0 = time.perf_counter_ns()
+        gc.collect(generation)
+        if self.metrics:
+            self.metrics.record(f"gc{generation}", time.perf_counter_ns() - t0)
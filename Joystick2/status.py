@@ -0,0 +1,31 @@
+# status.py
+# Tiny status socket for headless runs: connect (nc localhost PORT) and get one
+# JSON line with the current state, then the connection closes. Runs on its own
+# daemon thread and only ever reads what the control loop already published.
+import json
+import socket
+import threading
+import logging
+logger = logging.getLogger(__name__)
+
+def serve_status(port, get_status, host="127.0.0.1"):
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind((host, port))
+    server.listen(4)
+
+    def loop():
+        while True:
+            conn, _ = server.accept()
+            with conn:
+                try:
+                    conn.sendall((json.dumps(get_status()) + "\n").encode())
+                except OSError as e:
+                    logger.warning("status client went away: %s", e)
+                except Exception: #a bad snapshot must not take the status socket down for good
+                    logger.warning("status request failed", exc_info=True)
+
+    thread = threading.Thread(target=loop, name="status", daemon=True)
+    thread.start()
+    logger.warning("status socket listening on %s:%d", host, port)
+    return server
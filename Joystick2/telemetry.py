@@ -0,0 +1,84 @@
+# telemetry.py
+# Append-only channel log in a fixed size memory-mapped ring file. Each control
+# tick writes one record per device (that gimbal's channels, device = its
+# instance id, never sent) and one for the PPM decision on the mixed frame
+# (device = MIXED). Records are fixed-width, written with pack_into straight
+# into the mapping - no formatting, no syscall - so it can stay on in the
+# control loop, unlike printing every frame to a Pi's serial console.
+#
+# File: header  magic(8) record_size(u32) capacity(u32) written(u64)
+#       then capacity records of
+#         t_ns(u64, monotonic) device(u16) sent(u8) count(u8) us[MAX_CHANNELS](u16)
+# written counts every record ever written; the newest is at (written-1) % capacity.
+#
+#   python telemetry.py PATH [N]     print the last N records (default all)
+import os
+import sys
+import mmap
+import struct
+import threading
+
+MAGIC = b"PPMTLM1\0"
+MAX_CHANNELS = 16
+HEADER = struct.Struct("<8sIIQ")
+RECORD = struct.Struct(f"<QHBB{MAX_CHANNELS}H")
+WRITTEN_OFFSET = 16 #byte offset of the written counter in the header
+MIXED = 0xFFFF #device id for the mixed output frame
+
+class TelemetryWriter:
+    def __init__(self, path, capacity=65536):
+        self.capacity = capacity
+        size = HEADER.size + capacity * RECORD.size
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.ftruncate(fd, size)
+            self.map = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        HEADER.pack_into(self.map, 0, MAGIC, RECORD.size, capacity, 0)
+        self.written = 0
+        self.padding = (0,) * MAX_CHANNELS
+        # the asyncio runtime writes device records from the loop and the
+        # MIXED one from its output thread; uncontended with threads
+        self.lock = threading.Lock()
+
+    def write(self, t_ns, device, channel_us, sent):
+        count = min(len(channel_us), MAX_CHANNELS)
+        us = tuple(channel_us[:count]) + self.padding[count:]
+        with self.lock:
+            offset = HEADER.size + (self.written % self.capacity) * RECORD.size
+            RECORD.pack_into(self.map, offset, t_ns, device, sent, count, *us)
+            self.written += 1
+            struct.pack_into("<Q", self.map, WRITTEN_OFFSET, self.written)
+
+    def close(self):
+        self.map.flush()
+        self.map.close()
+
+def read_telemetry(path):
+    # -> records oldest first, each (t_ns, device, sent, channel_us tuple)
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, record_size, capacity, written = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or record_size != RECORD.size:
+        raise ValueError(f"{path} is not a telemetry log this reader understands")
+    first = max(0, written - capacity)
+    records = []
+    for n in range(first, written):
+        t_ns, device, sent, count, *us = RECORD.unpack_from(data, HEADER.size + (n % capacity) * RECORD.size)
+        records.append((t_ns, device, bool(sent), tuple(us[:count])))
+    return records
+
+def main():
+    if len(sys.argv) < 2:
+        sys.exit("usage: python telemetry.py PATH [N]")
+    records = read_telemetry(sys.argv[1])
+    if len(sys.argv) > 2:
+        records = records[-int(sys.argv[2]):]
+    t0 = records[0][0] if records else 0
+    for t_ns, device, sent, us in records:
+        source = "mixed" if device == MIXED else f"js{device}"
+        print(f"{(t_ns - t0) / 1e6:12.3f} ms  {source:5}  {'SENT' if sent else '----'}  {' '.join(map(str, us))}")
+
+if __name__ == "__main__":
+    main()
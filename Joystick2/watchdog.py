@@ -0,0 +1,87 @@
+# watchdog.py
+# Falls back to the failsafe PPM frame when the program stops producing
+# fresh output. pigpio repeats the last wave forever by itself, so without
+# this a stalled pygame, an unplugged stick or a hung control thread leaves
+# whatever throttle was last sent on air indefinitely.
+#
+# Each watched loop calls feed(name) whenever it does its job; if any of them
+# goes quiet for timeout_s the watchdog thread calls engage() once. It calls
+# recover() once every loop is feeding again. The thread only compares
+# integers and calls those two functions, nothing on that path encodes a
+# frame or allocates a wave.
+#
+# This can't help if the whole interpreter is wedged (the watchdog thread
+# needs the GIL too), only an out-of-process supervisor can catch that.
+import time
+import threading
+import logging
+logger = logging.getLogger(__name__)
+
+class FailsafeWatchdog:
+    def __init__(self, timeout_s, engage, recover, names=("control",),
+                 clock_ns=time.monotonic_ns, metrics=None):
+        self.timeout_ns = int(timeout_s * 1e9)
+        self.engage = engage
+        self.recover = recover
+        self.names = tuple(names)
+        self.clock_ns = clock_ns
+        self.metrics = metrics
+        now = clock_ns()
+        self.beats = dict.fromkeys(self.names, now) #name -> last feed, monotonic_ns
+        self.tripped = False
+        self.trips = 0
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def feed(self, name="control"):
+        self.beats[name] = self.clock_ns()
+
+    def check(self, now_ns=None):
+        # -> name of a stale loop, or None. Engages/recovers on the edges.
+        if now_ns is None:
+            now_ns = self.clock_ns()
+        stale = None
+        for name in self.names:
+            if now_ns - self.beats[name] > self.timeout_ns:
+                stale = name
+                break
+        if stale is not None and not self.tripped:
+            self.tripped = True
+            self.trips += 1
+            if self.metrics:
+                self.metrics.count("failsafe_engaged")
+                self.metrics.record("failsafe_stall", now_ns - self.beats[stale])
+            logger.warning("no fresh %s output for %.0f ms, engaging failsafe frame",
+                           stale, (now_ns - self.beats[stale]) / 1e6)
+            try:
+                self.engage()
+            except Exception: #e.g. pigpiod restarted and the wave is gone
+                logger.warning("engaging the failsafe failed", exc_info=True)
+        elif stale is None and self.tripped:
+            self.tripped = False
+            logger.warning("output fresh again, leaving failsafe")
+            try:
+                self.recover()
+            except Exception:
+                logger.warning("leaving the failsafe failed", exc_info=True)
+        return stale
+
+    def run(self):
+        # polling at a quarter of the timeout bounds detection at 1.25x timeout
+        interval = self.timeout_ns / 4e9
+        while not self.stopping.wait(interval):
+            try:
+                self.check()
+            except Exception: #the watchdog thread must outlive anything it calls
+                logger.warning("watchdog check failed", exc_info=True)
+
+    def start(self):
+        for name in self.names: #don't count startup time as a stall
+            self.feed(name)
+        self.thread = threading.Thread(target=self.run, name="watchdog", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        if self.thread:
+            self.thread.join()